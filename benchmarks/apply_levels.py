@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+compare the time spent to switch between two configs which only differ by some levels, on a
+process with a lot of loggers:
+
+- incremental: the incremental application
+- full: the full configuration, with the handler pool
+- dictConfig: the reset of all loggers followed by a logging.config.dictConfig (the old way)
+
+usage: python benchmarks/apply_levels.py [number of loggers]
+"""
+import logging
+import logging.config
+import os
+import sys
+import timeit
+from contextlib import contextmanager
+from copy import deepcopy
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'testproject.settings')
+
+
+def main(nb_loggers=5000, repeat=100):
+    import django
+    django.setup()
+    from dynamic_logging.applier import main_applier
+    from dynamic_logging.models import Config
+    from dynamic_logging.scheduler import main_scheduler
+    main_scheduler.disable()
+
+    for i in range(nb_loggers):
+        logging.getLogger('bench.module%d.sub%d' % (i // 50, i))
+    payloads = []
+    for level in ('DEBUG', 'ERROR'):
+        cfg = Config(name=level)
+        cfg.config = {'loggers': {
+            'bench.module%d' % i: {'handlers': ['null'], 'level': level} for i in range(10)
+        }}
+        payloads.append(cfg.get_logging_config())
+    main_applier.apply(payloads[0])
+
+    def switch():
+        for payload in payloads:
+            main_applier.apply(payload)
+
+    @contextmanager
+    def incremental():
+        yield
+
+    @contextmanager
+    def full():
+        # the static part of the configs seems to change at each application
+        with mock.patch.object(main_applier, 'get_fingerprint', side_effect=lambda payload: object()):
+            yield
+
+    def dict_config(payload):
+        for existing in main_applier.get_existing_loggers().values():
+            existing.handlers = []
+            existing.filters = []
+            existing.propagate = True
+        logging.config.dictConfig(deepcopy(payload))
+
+    print("switching %d times between 2 configs with %d loggers" % (repeat * 2, nb_loggers))
+    # the modes of the applier are all timed through main_applier.apply
+    for name, patch in (('incremental', incremental), ('full', full)):
+        main_applier.stats.clear()
+        with patch():
+            duration = timeit.timeit(switch, number=repeat)
+        assert main_applier.stats[name] == repeat * 2, main_applier.stats
+        print("%-12s %10.1f µs/switch" % (name, duration / (repeat * 2) * 1e6))
+    duration = timeit.timeit(lambda: [dict_config(payload) for payload in payloads], number=repeat)
+    print("%-12s %10.1f µs/switch" % ('dictConfig', duration / (repeat * 2) * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+measure the cost of the DEBUG records of a logger:
+
+- null: the records are given to a NullHandler (the cost of the creation of the records)
+- file: the records are written to a file
+- recorder: the records are kept by a FlightRecorderHandler of 1000 records, and never flushed
+- recorder+errors: the same, with an ERROR record every 10000 records, which write the last 1000 records
+
+usage: python benchmarks/flight_recorder.py [number of records]
+"""
+import logging
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main(nb_records=1000000):
+    from dynamic_logging.handlers import FlightRecorderHandler
+
+    bench = logging.getLogger('bench.flight_recorder')
+    bench.setLevel(logging.DEBUG)
+    bench.propagate = False
+    directory = tempfile.mkdtemp()
+    file_handler = logging.FileHandler(os.path.join(directory, 'bench.log'))
+    file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s:%(lineno)s] %(message)s'))
+
+    def run():
+        for i in range(nb_records):
+            bench.debug('record %s', i)
+
+    def run_with_errors():
+        for i in range(nb_records):
+            if i % 10000:
+                bench.debug('record %s', i)
+            else:
+                bench.error('error %s', i)
+
+    print("logging %d records" % nb_records)
+    try:
+        for name, handler, func in (('null', logging.NullHandler(), run),
+                                    ('file', file_handler, run),
+                                    ('recorder', FlightRecorderHandler(1000, logging.ERROR, file_handler), run),
+                                    ('recorder+errors', FlightRecorderHandler(1000, logging.ERROR, file_handler),
+                                     run_with_errors)):
+            bench.handlers = [handler]
+            duration = timeit.timeit(func, number=1)
+            print("%-16s %8.0f ns/record %8.2f M records/s" % (name, duration / nb_records * 1e9,
+                                                               nb_records / duration / 1e6))
+    finally:
+        file_handler.close()
+        os.remove(os.path.join(directory, 'bench.log'))
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
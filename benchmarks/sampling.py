@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+measure the cost of the records of a sampled logger:
+
+- disabled: the level of the logger is above the record (the cost of a logger not enabled)
+- sampled: the logger keep 1% of the records with the sample config, and emit them to a NullHandler
+- unsampled: the logger emit all the records to a NullHandler
+
+usage: python benchmarks/sampling.py [number of records]
+"""
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'testproject.settings')
+
+
+def main(nb_records=1000000):
+    import django
+    django.setup()
+    from dynamic_logging.models import Config
+    from dynamic_logging.scheduler import main_scheduler
+    main_scheduler.disable()
+
+    bench = logging.getLogger('bench.sampling')
+
+    def apply(**cfg):
+        config = Config(name='bench')
+        config.config = {'loggers': {'bench.sampling': dict({'handlers': ['null'], 'propagate': False}, **cfg)}}
+        config.apply()
+
+    def run():
+        for i in range(nb_records):
+            bench.info('record %s', i)
+
+    print("logging %d records" % nb_records)
+    for name, cfg in (('disabled', {'level': 'WARNING'}),
+                      ('sampled', {'level': 'INFO', 'sample': {'INFO': 0.01}}),
+                      ('unsampled', {'level': 'INFO'})):
+        apply(**cfg)
+        duration = timeit.timeit(run, number=1)
+        print("%-12s %8.0f ns/record %8.2f M records/s" % (name, duration / nb_records * 1e9,
+                                                           nb_records / duration / 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
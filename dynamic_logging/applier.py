@@ -0,0 +1,665 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import logging.config
+import threading
+from collections import Counter, namedtuple
+from copy import deepcopy
+
+from dynamic_logging.cache import LRUCache
+from dynamic_logging.filters import STACKLEVEL, RateLimitFilter, SamplingFilter
+from dynamic_logging.handlers import QueuedHandler
+from dynamic_logging.patterns import LoggerCreationHook, LoggerPatternTrie, is_pattern
+
+logger = logging.getLogger(__name__)
+
+HANDLER_DYNAMIC_KEYS = ('level', 'filters', 'queue')
+"""
+the keys of a handler config that can be updated on a living handler. the queue is not given to the
+handler: it wrap the handler in a QueuedHandler for the loggers.
+"""
+
+LoggerState = namedtuple('LoggerState', ['level', 'handlers', 'filters', 'propagate', 'disabled', 'sampler',
+                                         'rate_limiter'])
+LoggerState.__new__.__defaults__ = (None, None)
+"""
+the state to install on a logger. level, propagate and disabled are kept as is if None. sampler and rate_limiter
+are the SamplingFilter and RateLimitFilter of the logger, if any.
+"""
+
+
+class HandlerPool(object):
+    """
+    the living handlers, indexed by their name and by the definition they was built from.
+
+    a handler whose definition (all but its level and filters) did not change since the last
+    configuration is reused as is, to prevent reopening files, sockets and cie.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        """
+        name => (key, handler)
+        """
+
+    @staticmethod
+    def get_key(payload, name, keys):
+        """
+        return the key that identify the definition of a handler
+
+        :param dict payload: the config as given to dictConfig
+        :param str name: the name of the handler
+        :param dict keys: the keys already computed for the other handlers (used for the MemoryHandler targets)
+        :rtype: str
+        """
+        cfg = payload['handlers'][name]
+        return json.dumps({
+            'handler': {k: v for k, v in cfg.items() if k not in HANDLER_DYNAMIC_KEYS},
+            'formatter': payload.get('formatters', {}).get(cfg.get('formatter')),
+            'target': keys.get(cfg.get('target')),
+        }, sort_keys=True, default=repr)
+
+    def get(self, name, key):
+        """
+        return the living handler for this name if it was built from the same definition
+        :rtype: logging.Handler|None
+        """
+        key_handler = self.handlers.get(name)
+        if key_handler is not None and key_handler[0] == key:
+            return key_handler[1]
+        return None
+
+    def replace(self, handlers):
+        """
+        replace the pooled handlers by the given ones.
+        :param dict handlers: name => (key, handler)
+        """
+        self.handlers = handlers
+
+    def discard(self):
+        """
+        forget all the pooled handlers without closing them
+        """
+        self.handlers = {}
+
+
+class LoggingApplier(object):
+    """
+    keep trace of the logging state applied by dynamic_logging, and update the running loggers
+    and handlers incrementally.
+
+    the first application (and each application that change the static part of the config: formatters,
+    filters, classes of the handlers...) is a full configuration. all other applications only touch the
+    loggers and the handlers whose config changed since the last one.
+
+    in both cases, the new levels, handlers and filters are built first, then installed at once.
+    only the loggers configured by the previous payload are reset: apart from the first application,
+    the loggers the config never touched are left as is.
+
+    the loggers of the payload can be patterns (see LoggerPatternTrie). they are expanded into the
+    existing loggers at each application, and the loggers created afterward are configured at their
+    creation while the payload is applied.
+
+    the handlers with a `queue` config are given to the loggers wrapped in a QueuedHandler. the wrapper
+    is replaced (and the old one drained into the handler) only when the queue config change.
+    """
+
+    HANDLER_DYNAMIC_KEYS = HANDLER_DYNAMIC_KEYS
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.pool = HandlerPool()
+        self.configurator = None
+        """
+        the configurator used for the last full configuration. it hold the living handlers and filters.
+        :type: logging.config.DictConfigurator
+        """
+        self.static_fingerprint = None
+        """
+        the fingerprint of the static part of the currently applied payload
+        """
+        self.applied = None
+        """
+        the payload (as given to dictConfig) currently applied
+        :type: dict
+        """
+        self.fingerprints = LRUCache(64)
+        """
+        the static fingerprints of the last payloads: id(payload) => (payload, fingerprint)
+        """
+        self.configured_loggers = None
+        """
+        the names of the loggers configured by the currently applied payload. None if unknown, for
+        the first application: all the existing loggers will then be reset.
+        :type: set
+        """
+        self.effective_loggers = {}
+        """
+        the config of each logger configured by the currently applied payload, with the patterns expanded
+        """
+        self.patterns = None
+        """
+        (trie, {pattern: (config, LoggerState)}, exact names) of the currently applied payload, or None
+        if it has no pattern
+        """
+        self.queues = {}
+        """
+        the handlers used through a queue: name => (queue config, QueuedHandler)
+        """
+        self.creation_hook = LoggerCreationHook(self.on_logger_created)
+        self.stats = Counter()
+        """
+        the number of applications done for each mode: full and incremental
+        """
+
+    def reset(self):
+        """
+        forget the currently applied state. the next application will be a full one.
+        :return:
+        """
+        with self._lock:
+            self.configurator = self.static_fingerprint = self.applied = self.configured_loggers = None
+            self.effective_loggers = {}
+            self.set_patterns(None)
+            self.pool.discard()
+            self.stop_queues([wrapper for _, wrapper in self.queues.values()])
+            self.queues = {}
+
+    @classmethod
+    def get_static_fingerprint(cls, payload):
+        """
+        return a string which identify the part of the payload that can't be updated on living objects.
+        two payloads with the same static fingerprint differ only by their loggers and by the
+        level/filters of their handlers.
+
+        :param dict payload: the config as given to dictConfig
+        :rtype: str
+        """
+        static = {k: v for k, v in payload.items() if k != 'loggers'}
+        static['handlers'] = {
+            name: {k: v for k, v in cfg.items() if k not in cls.HANDLER_DYNAMIC_KEYS}
+            for name, cfg in payload.get('handlers', {}).items()
+        }
+        return json.dumps(static, sort_keys=True, default=repr)
+
+    def apply(self, payload):
+        """
+        apply the given payload to the logging system. the payload must not be updated afterward.
+
+        :param dict payload: the config as given to dictConfig
+        :return: True if the full configuration was done, False if it was incremental
+        :rtype: bool
+        """
+        fingerprint = self.get_fingerprint(payload)
+        with self._lock:
+            if self.applied is not None and not self.handlers_alive():
+                # our handlers was closed by someone else, who may have configured any logger
+                self.pool.discard()
+                self.applied = self.configured_loggers = None
+            loggers, trie = self.expand_loggers(payload)
+            full = self.applied is None or fingerprint != self.static_fingerprint
+            if full:
+                self.full_apply(payload, loggers)
+                mode = 'full'
+            else:
+                self.incremental_apply(payload, loggers)
+                mode = 'incremental'
+            self.stats[mode] += 1
+            self.static_fingerprint = fingerprint
+            self.applied = payload
+            self.effective_loggers = loggers
+            self.configured_loggers = set(loggers)
+            self.set_patterns(trie and (
+                trie,
+                {
+                    pattern: (cfg, self.plan_logger(self.configurator, pattern, cfg))
+                    for pattern, cfg in payload['loggers'].items() if is_pattern(pattern)
+                },
+                {name for name in payload['loggers'] if not is_pattern(name)},
+            ))
+        return full
+
+    @classmethod
+    def expand_loggers(cls, payload):
+        """
+        return the config of each logger to configure for the payload: the loggers named in the payload,
+        and the existing loggers matching one of its patterns. a logger named in the payload take
+        precedence over the patterns.
+
+        :param dict payload: the config as given to dictConfig
+        :return: the config by logger name, and the compiled patterns (None if the payload has no pattern)
+        :rtype: (dict, LoggerPatternTrie)
+        """
+        loggers = payload.get('loggers', {})
+        patterns = [name for name in loggers if is_pattern(name)]
+        if not patterns:
+            return loggers, None
+        trie = LoggerPatternTrie(patterns)
+        expanded = {name: cfg for name, cfg in loggers.items() if not is_pattern(name)}
+        for name in cls.get_existing_loggers():
+            if name not in expanded:
+                pattern = trie.match(name)
+                if pattern is not None:
+                    expanded[name] = loggers[pattern]
+        return expanded, trie
+
+    def set_patterns(self, patterns):
+        """
+        set the patterns used to configure the loggers created from now on, and hook the creation of the
+        loggers only while there is some.
+        """
+        self.patterns = patterns
+        if patterns:
+            self.creation_hook.install()
+        else:
+            self.creation_hook.uninstall()
+
+    def on_logger_created(self, created):
+        """
+        configure a newly created logger if it match one of the applied patterns
+        :param logging.Logger created: the new logger
+        """
+        # a logger created by another thread while a payload is applied wait for it, to get its state
+        with self._lock:
+            patterns = self.patterns
+            if patterns is None:
+                return
+            trie, states, exact = patterns
+            name = created.name
+            if name in exact:
+                return
+            pattern = trie.match(name)
+            if pattern is None:
+                return
+            cfg, state = states[pattern]
+            # each logger must own its lists of handlers and filters
+            self.install([], [(created, state._replace(handlers=list(state.handlers), filters=list(state.filters)))])
+            self.effective_loggers[name] = cfg
+            self.configured_loggers.add(name)
+
+    def get_fingerprint(self, payload):
+        """
+        return the static fingerprint of the payload, computed once for each payload object.
+        :param dict payload: the config as given to dictConfig
+        :rtype: str
+        """
+        cached = self.fingerprints.get(id(payload))
+        if cached is None or cached[0] is not payload:
+            cached = (payload, self.get_static_fingerprint(payload))
+            self.fingerprints.set(id(payload), cached)
+        return cached[1]
+
+    @staticmethod
+    def clear_cache():
+        """
+        clear the cache of the levels enabled for each logger (python >= 3.7).
+        the effective level of a logger depend on its parents, so all the cache is cleared at once.
+        """
+        clear_cache = getattr(logging.Logger.manager, '_clear_cache', None)
+        if clear_cache is not None:
+            clear_cache()
+
+    def handlers_alive(self):
+        """
+        check that the handlers created by the last full configuration was not replaced by a
+        configuration done outside of dynamic_logging (ie: a direct call to logging.config.dictConfig)
+        :rtype: bool
+        """
+        handlers = self.configurator.config.get('handlers', {})
+        return all(logging._handlers.get(name) is handler for name, handler in handlers.items())
+
+    def full_apply(self, payload, loggers):
+        """
+        configure the logging as dictConfig would do, but reuse the handlers whose definition did not change.
+        :param dict payload: the config as given to dictConfig
+        :param dict loggers: the config by logger name, with the patterns expanded
+        """
+        logger.debug("full application of the logging config")
+        # the configurator replace the config of each object by its instance,
+        # so it must work on its own copy of the payload
+        configurator = logging.config.DictConfigurator(deepcopy(payload))
+        config = configurator.config
+        for kind, configure in (('formatters', configurator.configure_formatter),
+                                ('filters', configurator.configure_filter)):
+            objects = config.get(kind, {})
+            for name in objects:
+                try:
+                    objects[name] = configure(objects[name])
+                except Exception as e:
+                    raise ValueError('Unable to configure %s %r: %s' % (kind[:-1], name, e))
+        pooled, handler_updates = self.configure_handlers(configurator, payload)
+        queues, _, stale_queues = self.plan_queues(configurator, payload)
+
+        try:
+            disable_existing = payload.get('disable_existing_loggers', True)
+            if self.configured_loggers is None:
+                # we don't know which loggers was configured before us: all of them are reset
+                plan = self.plan_existing_loggers(loggers, disable_existing)
+            else:
+                plan = [
+                    (logging.getLogger(name),
+                     self.reset_state(disable_existing and not self.is_child(name, loggers)))
+                    for name in self.configured_loggers - set(loggers)
+                ]
+            root = payload.get('root')
+            if root:
+                plan.append((logging.root, self.plan_logger(configurator, 'root', root, is_root=True, queues=queues)))
+            for name, cfg in loggers.items():
+                plan.append((logging.getLogger(name), self.plan_logger(configurator, name, cfg, queues=queues)))
+
+            self.install(handler_updates, plan)
+        except Exception:
+            self.stop_queues(self.get_new_queues(queues))
+            raise
+        self.configurator = configurator
+        self.pool.replace(pooled)
+        self.queues = queues
+        self.stop_queues(stale_queues)
+
+        # like dictConfig, we close and forget all the handlers that are not used anymore.
+        # closing a handler unregister its name, so the pooled handlers are named afterward.
+        with logging._lock:
+            stale = self.get_stale_handlers()
+            for handler in stale:
+                try:
+                    handler.flush()
+                    handler.close()
+                except Exception:  # pragma: nocover
+                    logger.exception("error while closing the handler %s", handler)
+            stale_ids = {id(handler) for handler in stale}
+            logging._handlerList[:] = [ref for ref in logging._handlerList if id(ref()) not in stale_ids]
+            for name, (_, handler) in self.pool.handlers.items():
+                handler.name = name
+
+    def plan_existing_loggers(self, loggers, disable_existing):
+        """
+        return the states to install on all the existing loggers which are not in the config,
+        as dictConfig does.
+        :param dict loggers: the configured loggers
+        :param bool disable_existing: the disabled status to give to the loggers not configured
+        :rtype: list
+        """
+        plan = []
+        for name, existing in self.get_existing_loggers().items():
+            if name in loggers:
+                continue
+            if self.is_child(name, loggers):
+                plan.append((existing, LoggerState(logging.NOTSET, [], [], True, None)))
+            else:
+                plan.append((existing, LoggerState(None, [], [], True, disable_existing)))
+        return plan
+
+    def configure_handlers(self, configurator, payload):
+        """
+        set up all the handlers of the configurator from the pool, and create the missing ones.
+
+        :param logging.config.DictConfigurator configurator: the configurator to set up
+        :param dict payload: the config as given to dictConfig
+        :return: the handlers to put in the pool (name => (key, handler)) and the updates to install
+                 on the reused handlers
+        :rtype: (dict, list)
+        """
+        handlers = configurator.config.get('handlers', {})
+        handlers_cfg = payload.get('handlers', {})
+        keys = {}
+        pooled = {}
+        updates = []
+        # the handlers with a target must be configured after their target
+        for name in sorted(handlers, key=lambda n: ('target' in handlers_cfg[n], n)):
+            handlers[name].pop('queue', None)
+            keys[name] = key = self.pool.get_key(payload, name, keys)
+            handler = self.pool.get(name, key)
+            if handler is None:
+                try:
+                    handler = configurator.configure_handler(handlers[name])
+                except Exception as e:
+                    raise ValueError('Unable to configure handler %r: %s' % (name, e))
+            else:
+                updates.append(self.plan_handler(configurator, handler, name, handlers_cfg[name]))
+            handlers[name] = handler
+            pooled[name] = (key, handler)
+        return pooled, updates
+
+    def plan_queues(self, configurator, payload):
+        """
+        return the queues to use for the payload: the current QueuedHandlers whose config did not change,
+        and new ones for the others. self.queues is not updated: the caller must set it once the loggers use
+        the new queues, or stop the new ones (see get_new_queues) if it fail.
+
+        :param logging.config.DictConfigurator configurator: the configurator holding the handlers
+        :param dict payload: the config as given to dictConfig
+        :return: the new queues (name => (queue config, QueuedHandler)), the names of the handlers whose
+                 queue changed, and the QueuedHandlers to stop once the loggers no more use them
+        :rtype: (dict, set, list)
+        """
+        living = configurator.config.get('handlers', {})
+        queues = {}
+        changed = set()
+        for name, cfg in payload.get('handlers', {}).items():
+            options = cfg.get('queue')
+            if not options:
+                continue
+            current = self.queues.get(name)
+            if current is not None and current[0] == options and current[1].target is living[name]:
+                queues[name] = current
+                continue
+            try:
+                queues[name] = (options, QueuedHandler(living[name], options))
+            except (ValueError, TypeError) as e:
+                self.stop_queues(self.get_new_queues(queues))
+                raise ValueError('Unable to configure handler %r: %s' % (name, e))
+            changed.add(name)
+        stale = []
+        for name, (_, wrapper) in self.queues.items():
+            if queues.get(name, (None, None))[1] is not wrapper:
+                changed.add(name)
+                stale.append(wrapper)
+        return queues, changed, stale
+
+    def get_new_queues(self, queues):
+        """
+        return the QueuedHandlers of the given queues that are not currently used
+        :param dict queues: the queues returned by plan_queues
+        :rtype: list[QueuedHandler]
+        """
+        current = {id(wrapper) for _, wrapper in self.queues.values()}
+        return [wrapper for _, wrapper in queues.values() if id(wrapper) not in current]
+
+    @staticmethod
+    def stop_queues(wrappers):
+        """
+        stop the given QueuedHandlers. their pending records are sent to their handler first.
+        """
+        for wrapper in wrappers:
+            try:
+                wrapper.close()
+            except Exception:  # pragma: nocover
+                logger.exception("error while stopping the queue of the handler %s", wrapper.target)
+
+    def get_stale_handlers(self):
+        """
+        return all the living handlers known by the logging module that are not in the pool
+        :rtype: list[logging.Handler]
+        """
+        pooled = {id(handler) for _, handler in self.pool.handlers.values()}
+        pooled.update(id(wrapper) for _, wrapper in self.queues.values())
+        living = (ref() for ref in logging._handlerList[:])
+        return [handler for handler in living if handler is not None and id(handler) not in pooled]
+
+    def plan_handler(self, configurator, handler, name, cfg, old_cfg=None):
+        """
+        return the level and the filters to install on a living handler.
+        :param logging.config.DictConfigurator configurator: the configurator holding the filters
+        :param logging.Handler handler: the handler to update
+        :param str name: the name of the handler in the config
+        :param dict cfg: the config of the handler
+        :param dict old_cfg: the config currently applied to the handler, if known.
+        :return: (handler, level, filters). level and filters are None if they don't change
+        """
+        level = filters = None
+        if old_cfg is None or cfg.get('level') != old_cfg.get('level'):
+            level = self._check_level(cfg.get('level', logging.NOTSET), 'handler', name)
+        if old_cfg is None or cfg.get('filters') != old_cfg.get('filters'):
+            filters = self._resolve(configurator, 'filters', cfg.get('filters', []), 'handler', name)
+        return handler, level, filters
+
+    def plan_logger(self, configurator, name, cfg, is_root=False, queues=None):
+        """
+        return the state to install on a logger, as dictConfig would have configured it.
+        :param logging.config.DictConfigurator configurator: the configurator holding the handlers and filters
+        :param str name: the name of the logger in the config
+        :param dict cfg: the config for this logger
+        :param bool is_root: True if the config is for the root logger
+        :param dict queues: the queues of the handlers, if not the current ones
+        :rtype: LoggerState
+        """
+        level = cfg.get('level')
+        handlers = self._resolve(configurator, 'handlers', cfg.get('handlers', []), 'logger', name)
+        queues = self.queues if queues is None else queues
+        if queues:
+            names = cfg.get('handlers', [])
+            handlers = [queues[n][1] if n in queues else handler for n, handler in zip(names, handlers)]
+        sampler = rate_limiter = None
+        try:
+            if cfg.get('sample') is not None:
+                sampler = SamplingFilter(cfg['sample'])
+            if cfg.get('rate_limit') is not None:
+                rate_limiter = RateLimitFilter(cfg['rate_limit'])
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            raise ValueError('Unable to configure logger %r: %s' % (name, e))
+        return LoggerState(
+            level=None if level is None else self._check_level(level, 'logger', name),
+            handlers=handlers,
+            filters=self._resolve(configurator, 'filters', cfg.get('filters', []), 'logger', name),
+            propagate=cfg.get('propagate'),
+            disabled=None if is_root else False,
+            sampler=sampler,
+            rate_limiter=rate_limiter,
+        )
+
+    @staticmethod
+    def install(handler_updates, plan):
+        """
+        install the new levels, handlers and filters in a short critical section. each attribute is
+        replaced with a single assignment, so the threads which log meanwhile always see either the
+        old or the new list of handlers, never an empty one.
+
+        :param list handler_updates: the (handler, level, filters) to install
+        :param list plan: the (logger, LoggerState) to install
+        """
+        with logging._lock:
+            for handler, level, filters in handler_updates:
+                if level is not None:
+                    handler.level = level
+                if filters is not None:
+                    handler.filters = filters
+            for target, state in plan:
+                if state.level is not None:
+                    target.level = state.level
+                target.handlers = state.handlers
+                filters = state.filters
+                wrappers = (state.rate_limiter, state.sampler)
+                if not STACKLEVEL:
+                    # without stacklevel, the wrappers would be the caller of the records: they are filtered once built
+                    filters = [f for f in (state.sampler, state.rate_limiter) if f is not None] + filters
+                    wrappers = ()
+                target.filters = filters
+                if state.propagate is not None:
+                    target.propagate = state.propagate
+                if state.disabled is not None:
+                    target.disabled = state.disabled
+                # the records are sampled, then rate limited, before being built
+                log = None
+                for wrapper in wrappers:
+                    if wrapper is not None:
+                        log = wrapper.wrap(target, log)
+                if log is not None:
+                    target._log = log
+                elif '_log' in target.__dict__:
+                    del target._log
+            LoggingApplier.clear_cache()
+
+    @staticmethod
+    def is_child(name, loggers):
+        """
+        return True if one of the parent of the logger is in the given loggers
+        """
+        parts = name.split('.')
+        return any('.'.join(parts[:i]) in loggers for i in range(1, len(parts)))
+
+    def incremental_apply(self, payload, loggers):
+        """
+        update only the handlers and loggers that differ from the currently applied payload.
+        :param dict payload: the config as given to dictConfig
+        :param dict loggers: the config by logger name, with the patterns expanded
+        """
+        configurator = self.configurator
+        old_handlers = self.applied.get('handlers', {})
+        old_loggers = dict(self.effective_loggers)
+        living_handlers = configurator.config.get('handlers', {})
+        handler_updates = [
+            self.plan_handler(configurator, living_handlers[name], name, cfg, old_handlers.get(name, {}))
+            for name, cfg in payload.get('handlers', {}).items()
+        ]
+        queues, queues_changed, stale_queues = self.plan_queues(configurator, payload)
+
+        def uses_changed_queue(cfg):
+            return queues_changed and not queues_changed.isdisjoint(cfg.get('handlers', []))
+
+        try:
+            disable_existing = payload.get('disable_existing_loggers', True)
+            plan = [
+                (logging.getLogger(name), self.reset_state(disable_existing and not self.is_child(name, loggers)))
+                for name in self.configured_loggers - set(loggers)
+            ]
+            plan.extend(
+                (logging.getLogger(name), self.plan_logger(configurator, name, cfg, queues=queues))
+                for name, cfg in loggers.items()
+                if old_loggers.get(name) != cfg or uses_changed_queue(cfg)
+            )
+            root = payload.get('root')
+            if root and uses_changed_queue(root):
+                plan.append((logging.root, self.plan_logger(configurator, 'root', root, is_root=True, queues=queues)))
+            self.install(handler_updates, plan)
+        except Exception:
+            self.stop_queues(self.get_new_queues(queues))
+            raise
+        self.queues = queues
+        self.stop_queues(stale_queues)
+        logger.debug("incremental application of the logging config: %d logger(s) changed", len(plan))
+
+    @staticmethod
+    def reset_state(disabled=False):
+        """
+        return the state of a logger that is no more configured.
+        :param bool disabled: the disabled status to give to the logger. like dictConfig, the children of the
+                              configured loggers must not be disabled
+        :rtype: LoggerState
+        """
+        return LoggerState(logging.NOTSET, [], [], True, disabled)
+
+    @staticmethod
+    def _check_level(level, owner_kind, owner_name):
+        try:
+            return logging._checkLevel(level)
+        except (ValueError, TypeError) as e:
+            raise ValueError('Unable to configure %s %r: %s' % (owner_kind, owner_name, e))
+
+    @staticmethod
+    def _resolve(configurator, kind, names, owner_kind, owner_name):
+        """
+        return the living objects (handlers or filters) for the given names.
+        :raise ValueError: if one name is not configured, like dictConfig does.
+        """
+        living = configurator.config.get(kind, {})
+        try:
+            return [living[n] for n in names]
+        except KeyError as e:
+            raise ValueError('Unable to configure %s %r: %s %s does not exist' % (owner_kind, owner_name, kind, e))
+
+    @staticmethod
+    def get_existing_loggers():
+        return {k: v for k, v in logging.Logger.manager.loggerDict.items() if isinstance(v, logging.Logger)}
+
+
+main_applier = LoggingApplier()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import logging
+import sys
+import threading
+from random import random
+from time import time
+
+from dynamic_logging.cache import LRUCache
+
+STACKLEVEL = sys.version_info >= (3, 8)
+"""
+True if Logger._log accept a stacklevel. the _log wrappers add their own frame to it, so findCaller still
+give the call site of the record (python < 3.8 give the wrapper)
+"""
+
+
+class SamplingFilter(logging.Filter):
+    """
+    keep only a part of the records. it is installed by dynamic_logging on the loggers with a `sample` config:
+
+    - a rate from 0 to 1, for all the levels: "sample": 0.1
+    - a rate by level. the records of the other levels are all kept: "sample": {"INFO": 0.01, "DEBUG": 0.001}
+
+    the decision is a single call to random.random(): no lock and no state, so one filter can be shared by
+    many loggers and threads. on the loggers, it is taken before the record is built (see wrap), which is
+    the most expensive part of the logging of a record. without STACKLEVEL, it is a plain filter of the logger.
+    """
+
+    def __init__(self, sample):
+        super(SamplingFilter, self).__init__()
+        if isinstance(sample, dict):
+            self.rate = None
+            self.rates = {logging._checkLevel(level): float(rate) for level, rate in sample.items()}
+        else:
+            self.rate = float(sample)
+            self.rates = None
+
+    def sample(self, level):
+        """
+        return True if a record of this level must be kept
+        """
+        rate = self.rate if self.rates is None else self.rates.get(level, 1.0)
+        return rate >= 1 or random() < rate
+
+    def filter(self, record):
+        return self.sample(record.levelno)
+
+    def wrap(self, target, log=None):
+        """
+        return a replacement of the _log method of the logger that drop the records before building them
+        :param logging.Logger target: the logger to sample
+        :param log: the _log function to call for the records kept. default to the one of the logger class
+        """
+        log = log or type(target)._log.__get__(target)
+        rate, rates = self.rate, self.rates
+        # the decision is inlined: this run for each record of the logger
+        if rates is None:
+            def _log(level, *args, **kwargs):
+                if rate >= 1 or random() < rate:
+                    if STACKLEVEL:
+                        kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 1
+                    log(level, *args, **kwargs)
+        else:
+            def _log(level, *args, **kwargs):
+                level_rate = rates.get(level, 1.0)
+                if level_rate >= 1 or random() < level_rate:
+                    if STACKLEVEL:
+                        kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 1
+                    log(level, *args, **kwargs)
+
+        return _log
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    let pass at most `rate` records of each key for each `period` seconds [default: 1]. the key of a record
+    is its logger, its level and its message template (not formatted). the last `keys` keys [default: 1000]
+    are remembered.
+
+    it is installed by dynamic_logging on the loggers with a `rate_limit` config: the rate, or a dict with
+    rate, period and keys. like the SamplingFilter, it is taken before the record is built, and the next
+    record of a key that suppressed some is preceded by a summary record of the same level. without STACKLEVEL,
+    it is a plain filter of the logger, which give the number of suppressed records in record.suppressed.
+    """
+
+    def __init__(self, rate_limit):
+        super(RateLimitFilter, self).__init__()
+        if not isinstance(rate_limit, dict):
+            rate_limit = {'rate': rate_limit}
+        self.rate = int(rate_limit['rate'])
+        self.period = float(rate_limit.get('period', 1))
+        self.keys = LRUCache(int(rate_limit.get('keys', 1000)))
+        """
+        key => [start of the period, records passed, records suppressed]
+        """
+        self._lock = threading.Lock()
+
+    def allow(self, name, level, msg):
+        """
+        count a record, and return if it must pass.
+        :return: True if the record must pass, and the number of records suppressed in the previous period
+                 of its key
+        :rtype: (bool, int)
+        """
+        key = (name, level, msg if isinstance(msg, str) else str(msg))
+        now = time()
+        with self._lock:
+            state = self.keys.get(key)
+            if state is None or now - state[0] >= self.period:
+                self.keys.set(key, [now, 1, 0])
+                return True, state[2] if state is not None else 0
+            if state[1] < self.rate:
+                state[1] += 1
+                return True, 0
+            state[2] += 1
+            return False, 0
+
+    def filter(self, record):
+        allowed, suppressed = self.allow(record.name, record.levelno, record.msg)
+        if suppressed:
+            record.suppressed = suppressed
+        return allowed
+
+    def wrap(self, target, log=None):
+        """
+        return a replacement of the _log method of the logger that drop the records over the rate before
+        building them
+        :param logging.Logger target: the logger to limit
+        :param log: the _log function to call for the records kept. default to the one of the logger class
+        """
+        log = log or type(target)._log.__get__(target)
+        allow = self.allow
+        name = target.name
+
+        def _log(level, msg, args, *other, **kwargs):
+            allowed, suppressed = allow(name, level, msg)
+            if not (allowed or suppressed):
+                return
+            if STACKLEVEL:
+                kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 1
+            if suppressed:
+                summary = {'stacklevel': kwargs['stacklevel']} if STACKLEVEL else {}
+                log(level, "%d records like %r were suppressed", (suppressed, msg), extra={'suppressed': suppressed},
+                    **summary)
+            if allowed:
+                log(level, msg, args, *other, **kwargs)
+
+        return _log
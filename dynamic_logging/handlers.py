@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+import copy
 import logging
+import queue
 import threading
-from collections import defaultdict
+import weakref
+from collections import defaultdict, deque
 from contextlib import contextmanager
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
 
 logger = logging.getLogger(__name__)
 
@@ -25,3 +29,173 @@ class MockHandler(logging.Handler):
     def emit(self, record):
         for messages_list in self._messages_by_thread[threading.current_thread()]:
             messages_list[record.levelname.lower()].append(record.getMessage())
+
+
+class BlockingQueueListener(QueueListener):
+    """
+    a QueueListener that wait for some room in a full queue to stop
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class QueuedHandler(QueueHandler):
+    """
+    a handler that put the records in a bounded queue, for a thread which send them to the target handler.
+    the thread that log don't wait for a slow handler (mail, network, file on a slow disk...).
+
+    it is created by dynamic_logging for the handlers with a `queue` config: true, or a dict with
+    - size: the max number of records in the queue [default: 10000]
+    - policy: what to do with a record when the queue is full: `drop` it [default] or `block` until there is room
+
+    the level and the filters of the target are still checked, in the thread.
+    """
+
+    POLICIES = ('drop', 'block')
+
+    def __init__(self, target, options):
+        if not isinstance(options, dict):
+            options = {}
+        self.size = int(options.get('size', 10000))
+        self.policy = options.get('policy', 'drop')
+        if self.policy not in self.POLICIES:
+            raise ValueError("the queue policy must be one of %s, not %r" % (', '.join(self.POLICIES), self.policy))
+        super(QueuedHandler, self).__init__(queue.Queue(self.size))
+        self.target = target
+        self.dropped = 0
+        """
+        the number of records dropped because the queue was full
+        """
+        self.stopped = False
+        self.listener = BlockingQueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # the record stay in the process: only the arguments, which may be updated meanwhile, are merged
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.stopped:
+            # a record logged by a thread that got this handler before it was replaced
+            self.listener.handle(record)
+        elif self.policy == 'block':
+            self.queue.put(record)
+        else:
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+    def stop(self):
+        """
+        stop the thread once all the queued records are sent to the target
+        """
+        if not self.stopped:
+            self.stopped = True
+            self.listener.stop()
+            # the records put by the threads that was logging while the listener stopped
+            while True:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is not None:
+                    self.listener.handle(record)
+
+    def close(self):
+        self.stop()
+        super(QueuedHandler, self).close()
+
+
+flight_recorders = weakref.WeakSet()
+"""
+the living FlightRecorderHandlers
+"""
+
+
+def clear_flight_recorders():
+    """
+    forget the records kept by all the flight recorders for the current thread. it is called by the
+    RequestLoggingMiddleware at the start of each request, so a flush only give the records of the request.
+    """
+    for recorder in list(flight_recorders):
+        recorder.clear()
+
+
+class FlightRecorderHandler(MemoryHandler):
+    """
+    keep the last `capacity` records of each thread, and send them to the target handler only when a record
+    of `flushLevel` [default: ERROR] or above is handled. the records of a normal request cost only their
+    creation: they are kept as is, with their message template and arguments not formatted, and
+    forgotten when the ring buffer is full or at the start of the next request.
+
+    in settings.LOGGING::
+
+        'flight_recorder': {
+            'class': 'dynamic_logging.handlers.FlightRecorderHandler',
+            'capacity': 200,
+            'flushLevel': 'ERROR',
+            'target': 'file',
+        }
+
+    the arguments of the records are formatted only when they are flushed: they must not be updated meanwhile.
+    """
+
+    def __init__(self, capacity=100, flushLevel=logging.ERROR, target=None):
+        super(FlightRecorderHandler, self).__init__(int(capacity), logging._checkLevel(flushLevel), target)
+        self.local = threading.local()
+        flight_recorders.add(self)
+
+    def get_buffer(self):
+        """
+        return the ring buffer of the current thread
+        :rtype: collections.deque
+        """
+        try:
+            return self.local.buffer
+        except AttributeError:
+            buffer = self.local.buffer = deque(maxlen=self.capacity)
+            return buffer
+
+    def handle(self, record):
+        # the buffer is local to the thread: no lock is needed to keep a record
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        buffer = self.get_buffer()
+        if record.levelno < self.flushLevel:
+            buffer.append(record)
+            return
+        buffer.append(record)
+        records = list(buffer)
+        buffer.clear()
+        target = self.target
+        if target is not None:
+            for kept in records:
+                if kept.levelno >= target.level:
+                    target.handle(kept)
+
+    def flush(self):
+        """
+        the kept records are sent only with a record of flushLevel: there is nothing to flush
+        """
+
+    def clear(self):
+        """
+        forget the records kept for the current thread
+        """
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer:
+            buffer.clear()
+
+    def close(self):
+        flight_recorders.discard(self)
+        self.local = threading.local()
+        super(FlightRecorderHandler, self).close()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import heapq
+from bisect import bisect_right
+
+from django.db.models.query_utils import Q
+from django.utils.dateparse import parse_datetime
+
+from dynamic_logging.models import Config, Trigger
+
+
+class TriggerIndex(object):
+    """
+    the active triggers of a time window, indexed in memory to answer the questions of the scheduler
+    without querying the database.
+
+    the start and end dates of the triggers split the time into segments, in which the set of the valid
+    triggers don't change. the trigger to enable in each segment is computed once by a sweep over the
+    segments, so finding the trigger valid at a date is a binary search on the segments: O(log n).
+
+    a trigger without start date is valid since ever, and one without end date is valid forever.
+    """
+
+    def __init__(self, triggers, since=None):
+        self.since = since
+        """
+        the date since which the index is complete. None if it contains all the active triggers
+        """
+        self.triggers = sorted(triggers, key=self.rank)
+        self.by_start = [t for t in self.triggers if t.start_date is not None]
+        self.starts = [t.start_date for t in self.by_start]
+        self.boundaries = sorted(
+            {t.start_date for t in self.by_start} | {t.end_date for t in self.triggers if t.end_date is not None}
+        )
+        self.latest, self.earliest = self.sweep()
+
+    @classmethod
+    def load(cls, since=None):
+        """
+        load the active triggers which can be valid after the given date, with their config, in one query.
+        :param datetime.datetime since: the start of the window to load. None to load all the triggers.
+        :rtype: TriggerIndex
+        """
+        qs = Trigger.objects.filter(is_active=True).select_related('config')
+        if since is not None:
+            qs = qs.filter(Q(end_date__gt=since) | Q(end_date__isnull=True) | Q(start_date__gt=since))
+        return cls(qs, since)
+
+    def dump(self):
+        """
+        return a snapshot of the index, that can be serialized in json and loaded in another process
+        without querying the database
+        :rtype: dict
+        """
+        def date(value):
+            return None if value is None else value.isoformat()
+
+        configs = {}
+        triggers = []
+        for trigger in self.triggers:
+            config = trigger.config
+            configs[str(config.pk)] = {'name': config.name, 'config_json': config.config_json}
+            triggers.append({
+                'pk': trigger.pk, 'name': trigger.name, 'config': config.pk,
+                'start_date': date(trigger.start_date), 'end_date': date(trigger.end_date),
+            })
+        return {'since': date(self.since), 'configs': configs, 'triggers': triggers}
+
+    @classmethod
+    def load_snapshot(cls, snapshot):
+        """
+        build an index from the result of dump()
+        :rtype: TriggerIndex
+        """
+        def date(value):
+            return None if value is None else parse_datetime(value)
+
+        configs = {
+            pk: Config(pk=int(pk), name=cfg['name'], config_json=cfg['config_json'])
+            for pk, cfg in snapshot['configs'].items()
+        }
+        return cls(
+            [
+                Trigger(pk=t['pk'], name=t['name'], config=configs[str(t['config'])], is_active=True,
+                        start_date=date(t['start_date']), end_date=date(t['end_date']))
+                for t in snapshot['triggers']
+            ],
+            since=date(snapshot['since'])
+        )
+
+    @staticmethod
+    def rank(trigger):
+        """
+        the order of precedence of the triggers: by start date, the ones without start date first
+        """
+        start = trigger.start_date
+        return (-float('inf') if start is None else start.timestamp()), trigger.pk or 0
+
+    def sweep(self):
+        """
+        compute for each segment the valid trigger which started the latest and the one which started the earliest
+        :return: the two lists of triggers (or None) by segment
+        :rtype: (list, list)
+        """
+        latest, earliest = [], []
+        latest_heap, earliest_heap = [], []
+        pending = 0
+        for i in range(len(self.boundaries) + 1):
+            segment_start = self.boundaries[i - 1] if i else None
+            while pending < len(self.triggers):
+                trigger = self.triggers[pending]
+                if trigger.start_date is not None and (segment_start is None or trigger.start_date > segment_start):
+                    break
+                # the triggers are sorted by rank: their position break the ties
+                heapq.heappush(latest_heap, (-pending, trigger))
+                heapq.heappush(earliest_heap, (pending, trigger))
+                pending += 1
+            for heap, result in ((latest_heap, latest), (earliest_heap, earliest)):
+                # the ended triggers are dropped only when they reach the top
+                while heap and segment_start is not None and heap[0][1].end_date is not None \
+                        and heap[0][1].end_date <= segment_start:
+                    heapq.heappop(heap)
+                result.append(heap[0][1] if heap else None)
+        return latest, earliest
+
+    def covers(self, date):
+        """
+        return True if the index can answer for the given date
+        """
+        return self.since is None or date >= self.since
+
+    def segment(self, date):
+        return bisect_right(self.boundaries, date)
+
+    def current(self, date):
+        """
+        the trigger to enable at the given date: the valid one which started the latest
+        :rtype: Trigger|None
+        """
+        return self.latest[self.segment(date)]
+
+    def earliest_valid(self, date):
+        """
+        the valid trigger at the given date which started the earliest
+        :rtype: Trigger|None
+        """
+        return self.earliest[self.segment(date)]
+
+    def next_start(self, after):
+        """
+        the first trigger to start strictly after the given date
+        :rtype: Trigger|None
+        """
+        i = bisect_right(self.starts, after)
+        return self.by_start[i] if i < len(self.by_start) else None
+
+    def get_next_wake(self, current, after):
+        """
+        return the next trigger to apply and the date at which it may occure. see Scheduler.get_next_wake
+
+        :param Trigger current: the current trigger active (which won't be reenabled)
+        :param datetime.datetime after: the date to use to check current time
+        :rtype: (Trigger, datetime.datetime)
+        """
+        # next wake is the earliest of :
+        # - the end of the current one
+        # - the start of a new one
+        next_trigger = self.next_start(after)  # type: Trigger
+
+        # boolean opperation is
+        # w = current trigger is null
+        # x = current trigger's end date is null =>_trigger don't end
+        # y = no next trigger
+        # z = current trigger end befor the next one start
+
+        # results are
+        # a = activate next trigger at next trigger start date
+        # b = find best trigger at current one end date
+        # c = no trigger
+
+        # boolean simplification lead to:
+        # c = y and not b
+        # a = not y and not b
+        # b = not w and not x and (y or (not y and z))
+
+        # start with b case => find best trigger at the end of the current one
+        if (
+            current is not None  # not w
+            and current.end_date is not None  # not x
+            and (next_trigger is None or current.end_date < next_trigger.start_date)
+        ):
+            # b =>
+            # the earliest to start, or the default if no trigger is active at the end of the current one
+            last_active = self.earliest_valid(current.end_date) or Trigger.default()
+            return last_active, current.end_date
+        elif next_trigger is None:  # case c = not b and y
+            return current or Trigger.default(), None
+        else:  # case a (last case)
+            return next_trigger, next_trigger.start_date
+
+    def __len__(self):
+        return len(self.triggers)
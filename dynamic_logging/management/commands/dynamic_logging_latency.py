@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from dynamic_logging.metrics import main_metrics
+from dynamic_logging.models import Config, Trigger
+
+
+class Command(BaseCommand):
+    help = "measure the latency of the propagation of a change by the current propagator, and display it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--probes', type=int, default=5, help="the number of changes to propagate")
+        parser.add_argument('--timeout', type=float, default=120,
+                            help="the seconds to wait for the propagation of each change")
+        parser.add_argument('--interval', type=float, default=0.5, help="the seconds to wait between two changes")
+
+    def handle(self, *args, **options):
+        propagator = apps.get_app_config('dynamic_logging').propagator
+        tags = {'propagator': type(propagator).__name__}
+
+        def received():
+            histogram = main_metrics.get('receive_to_apply', **tags)
+            return histogram.count if histogram else 0
+
+        # an inactive trigger change the generation of the propagators without changing the logging
+        config = Config.objects.create(name='dynamic_logging latency probe', config_json='{}')
+        trigger = Trigger.objects.create(name='dynamic_logging latency probe', config=config, is_active=False)
+        try:
+            for _ in range(options['probes']):
+                count = received()
+                trigger.save()
+                deadline = time.time() + options['timeout']
+                while received() <= count:
+                    if time.time() > deadline:
+                        raise CommandError("the change was not propagated by %s after %ss" % (
+                            tags['propagator'], options['timeout']))
+                    time.sleep(0.01)
+                time.sleep(options['interval'])
+        finally:
+            trigger.delete()
+            config.delete()
+
+        self.stdout.write("metric\tpropagator\tcount\tmean\tp50\tp90\tp99\tmax (ms)")
+        for name, metric_tags, summary in main_metrics.summary():
+            self.stdout.write("\t".join(
+                [name, metric_tags.get('propagator', ''), str(summary['count'])] + [
+                    '%.1f' % (summary[key] * 1000) for key in ('mean', 'p50', 'p90', 'p99', 'max')
+                ]
+            ))
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from dynamic_logging.timeline import simulate
+
+
+class Command(BaseCommand):
+    help = "display the configs the scheduler would apply in the given period, without applying them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="the start of the period (ISO 8601). default to now")
+        parser.add_argument('--end', help="the end of the period (ISO 8601). default to start + --days")
+        parser.add_argument('--days', type=int, default=30, help="the length of the period, in days")
+        parser.add_argument('--all', action='store_true', dest='show_all',
+                            help="also display the wakes which don't change the logging config")
+
+    def parse_date(self, value):
+        date = parse_datetime(value)
+        if date is None:
+            raise CommandError("%r is not a valid date" % value)
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    def handle(self, *args, **options):
+        start = self.parse_date(options['start']) if options['start'] else timezone.now()
+        if options['end']:
+            end = self.parse_date(options['end'])
+        else:
+            end = start + datetime.timedelta(days=options['days'])
+        for event in simulate(start, end):
+            if not (event.applied or options['show_all']):
+                continue
+            self.stdout.write("%s\t%s%s" % (
+                event.date.isoformat(), event.trigger, '' if event.applied else ' (unchanged)'
+            ))
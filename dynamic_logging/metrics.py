@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import bisect
+import logging
+import threading
+
+from django.utils.module_loading import import_string
+
+from dynamic_logging.settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram(object):
+    """
+    a histogram of durations in seconds, with exponential buckets from 1ms to about 9 minutes.
+    the percentiles are the upper bound of their bucket: they are precise to a factor 2.
+    """
+
+    BOUNDS = tuple(0.001 * 2 ** i for i in range(20))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        return the upper bound of the bucket of the given percentile, or None if nothing was recorded
+        :param float percent: the percentile to return, from 0 to 100
+        :rtype: float|None
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            rank = percent * self.count / 100.0
+            seen = 0
+            for i, count in enumerate(self.counts):
+                seen += count
+                if count and seen >= rank:
+                    return self.BOUNDS[i] if i < len(self.BOUNDS) else self.max
+            return self.max  # pragma: nocover
+
+    def summary(self):
+        """
+        :rtype: dict
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+class Metrics(object):
+    """
+    the histograms of the values recorded by dynamic_logging, by name and tags. each value is given too to the
+    callable at the path of the setting `metrics_hook`, as hook(name, value, tags), to export it to a metrics
+    system (statsd, prometheus...).
+
+    the recorded values are:
+
+    - receive_to_apply: the seconds from the reception of a propagated change to the application of the config
+    - save_to_apply: the seconds from the save of a trigger or config to the application of the config. it
+      include the clock skew between the servers.
+
+    both are tagged with the name of the propagator class.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, value, **tags):
+        key = (name, tuple(sorted(tags.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+        histogram.record(value)
+        hook = get_setting('metrics_hook')
+        if hook is not None:
+            try:
+                import_string(hook)(name, value, tags)
+            except Exception:
+                logger.exception("the metrics hook %s failed", hook)
+
+    def get(self, name, **tags):
+        """
+        return the histogram of the given name and tags, or None if nothing was recorded
+        :rtype: Histogram|None
+        """
+        return self.histograms.get((name, tuple(sorted(tags.items()))))
+
+    def summary(self):
+        """
+        return the summary of all the histograms, sorted by name and tags
+        :rtype: list[(str, dict, dict)]
+        """
+        with self._lock:
+            items = sorted(self.histograms.items())
+        return [(name, dict(tags), histogram.summary()) for (name, tags), histogram in items]
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+
+main_metrics = Metrics()
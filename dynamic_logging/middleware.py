@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from dynamic_logging.handlers import clear_flight_recorders
+from dynamic_logging.request_scope import current_rules, main_request_rules
+
+
+class RequestLoggingMiddleware(object):
+    """
+    enable the request rules of the current config (the `requests` section) for the requests they match.
+    it must be after the AuthenticationMiddleware to match the user_id.
+
+    it also clear the flight recorders (see FlightRecorderHandler) at the start of each request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        clear_flight_recorders()
+        if not main_request_rules.rules:
+            return self.get_response(request)
+        token = current_rules.set(main_request_rules.match(request))
+        try:
+            return self.get_response(request)
+        finally:
+            current_rules.reset(token)
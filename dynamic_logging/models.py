@@ -3,7 +3,6 @@ import datetime
 import hashlib
 import json
 import logging
-import logging.config
 from copy import deepcopy
 
 from django.conf import settings
@@ -12,13 +11,29 @@ from django.db import models
 from django.db.models import CASCADE
 from django.db.models.query_utils import Q
 from django.utils import timezone
+from django.utils.module_loading import import_string
 from django.utils.six import python_2_unicode_compatible
 from django.utils.translation import ugettext as _
 
+from dynamic_logging.applier import main_applier
+from dynamic_logging.cache import LRUCache
+from dynamic_logging.handlers import FlightRecorderHandler
+from dynamic_logging.request_scope import main_request_rules
+from dynamic_logging.settings import get_setting
 from dynamic_logging.signals import config_applied
 
 module_logger = logging.getLogger(__name__)
 
+compiled_configs = LRUCache(get_setting('compiled_cache_size'))
+"""
+the (complete config given to the logging system, effective hash) by (Config.get_hash(), settings fingerprint)
+"""
+
+parsed_configs = LRUCache(get_setting('compiled_cache_size'))
+"""
+the parsed Config.config_json, by their content
+"""
+
 
 def now_plus_2hours():
     return timezone.now() + datetime.timedelta(hours=2)
@@ -32,7 +47,15 @@ class TriggerQueryset(models.QuerySet):
         :param end:
         :return:
         """
-        return self.filter(
+        return self.filter(self.valid_at_q(date))
+
+    @staticmethod
+    def valid_at_q(date):
+        """
+        the condition of the triggers valid at the given time
+        :rtype: Q
+        """
+        return (
             (Q(start_date__lte=date) | Q(start_date__isnull=True))
             &
             (Q(end_date__gt=date) | Q(end_date__isnull=True))
@@ -106,10 +129,35 @@ class Config(models.Model):
     """
 
     KEEPT_CONFIG = {
-        'loggers': ['level', 'propagate', 'filters', 'handlers'],
-        'handlers': ['level', 'filters']
+        'loggers': ['level', 'propagate', 'filters', 'handlers', 'sample', 'rate_limit', 'sql_slow_threshold',
+                    'sql_sample_rate'],
+        'handlers': ['level', 'filters', 'queue', 'capacity', 'flushLevel']
     }
 
+    HANDLER_KEYS = ('filters', 'level', 'queue')
+    """
+    the keys of the handlers of the settings that a config can update
+    """
+
+    RECORDER_KEYS = ('capacity', 'flushLevel')
+    """
+    the keys that a config can update too on the FlightRecorderHandlers
+    """
+
+    OPTIONAL_CONFIG = {
+        'requests': ['header', 'value', 'user_id', 'path_prefix', 'sample', 'loggers'],
+    }
+    """
+    the sections kept only if they are in the config
+    """
+
+    _settings_fingerprint = None
+
+    _parsed_config = None
+    """
+    the last (config_json, config) parsed by this instance
+    """
+
     name = models.CharField(max_length=255)
 
     config_json = models.TextField(validators=[json_value], default='{}')
@@ -139,33 +187,73 @@ class Config(models.Model):
         """
         return settings.LOGGING.get('filters', {})
 
+    @classmethod
+    def get_settings_fingerprint(cls):
+        """
+        return a digest of settings.LOGGING. it is computed only once for each settings object.
+        :rtype: bytes
+        """
+        logging_settings = settings.LOGGING
+        cached = cls._settings_fingerprint
+        if cached is None or cached[0] is not logging_settings:
+            dumped = json.dumps(logging_settings, sort_keys=True, default=repr)
+            cached = cls._settings_fingerprint = (logging_settings, hashlib.sha256(dumped.encode('utf-8')).digest())
+        return cached[1]
+
     @classmethod
     def get_existing_loggers(cls):
-        return {k: v for k, v in logging.Logger.manager.loggerDict.items() if isinstance(v, logging.Logger)}
+        return main_applier.get_existing_loggers()
 
     @property
     def config(self):
-        if not self.config_json:
-            return {}
-        res = {}
-        loaded = json.loads(self.config_json)
-        for cfg, sub in self.KEEPT_CONFIG.items():
-            res.setdefault(cfg, {}).update({
-                name: {k: v for k, v in cfg.items() if k in sub}
-                for name, cfg in loaded.get(cfg, {}).items()
-            })
+        """
+        the config_json parsed and filtered with KEEPT_CONFIG. it is parsed only once for each content of
+        config_json, and shared with all the instances having the same: it must not be updated.
+        :rtype: dict
+        """
+        config_json = self.config_json
+        cached = self._parsed_config
+        if cached is not None and (cached[0] is config_json or cached[0] == config_json):
+            return cached[1]
+        if not config_json:
+            res = {}
+        else:
+            res = parsed_configs.get(config_json)
+            if res is None:
+                res = self.parse_config(config_json)
+                parsed_configs.set(config_json, res)
+        self._parsed_config = (config_json, res)
         return res
 
-    @config.setter
-    def config(self, val):
+    @classmethod
+    def parse_config(cls, config_json):
+        """
+        parse the given json and keep only the keys allowed by KEEPT_CONFIG
+        :param str config_json: the json to parse
+        :rtype: dict
+        :raise ValueError: if the json is not valid
+        """
+        return cls.filter_config(json.loads(config_json))
+
+    @classmethod
+    def filter_config(cls, config):
+        """
+        return a copy of the config with only the keys allowed by KEEPT_CONFIG and OPTIONAL_CONFIG
+        :rtype: dict
+        """
         res = {}
-        for cfg, sub in self.KEEPT_CONFIG.items():
+        for cfg, sub in list(cls.KEEPT_CONFIG.items()) + list(cls.OPTIONAL_CONFIG.items()):
+            if cfg in cls.OPTIONAL_CONFIG and cfg not in config:
+                continue
             res[cfg] = {
                 name: {k: v for k, v in cfg.items() if k in sub}
-                for name, cfg in val.get(cfg, {}).items()
-
+                for name, cfg in config.get(cfg, {}).items()
             }
-        self.config_json = json.dumps(res)
+        return res
+
+    @config.setter
+    def config(self, val):
+        self.config_json = json.dumps(self.filter_config(val))
 
     def get_hash(self):
         h = hashlib.sha256()
@@ -173,32 +261,81 @@ class Config(models.Model):
         h.update(self.config_json.encode('utf-8'))
         return h.digest()
 
-    def apply(self, trigger=None):
+    def get_logging_config(self):
         """
-        apply the current config to the global logging system.
-        it will override all handlers and loggers currently active.
-        :return:
+        return the complete config to give to the logging system: settings.LOGGING with the loggers
+        and handlers of this config merged into. the result is cached and must not be updated.
+        :rtype: dict
         """
-        config = deepcopy(settings.LOGGING)
-        # we merge the loggers and handlers into the default config
-        config['loggers'] = self.create_loggers(self.config.get('loggers', {}))
-        config['handlers'] = self.merge_handlers(config.get('handlers', {}), self.config.get('handlers', {}))
-        module_logger.info("[%s] applying logging config %s: %r" % (trigger, self, config))
-        self._reset_logging()
-        module_logger.debug("applying config %s", json.dumps(config, default=repr))
-        # print("apply %s : %s " % (self.name, json.dumps(config)))
-        logging.config.dictConfig(config)
-        config_applied.send(self.__class__, config=self)
+        return self._get_compiled()[0]
+
+    def get_effective_hash(self):
+        """
+        return a digest of the logging state this config lead to. unlike get_hash, it does not depend on the pk
+        nor on the formatting of config_json, so two configs with the same effective state share the same.
+        :rtype: bytes
+        """
+        return self._get_compiled()[1]
+
+    def _get_compiled(self):
+        key = (self.get_hash(), self.get_settings_fingerprint())
+        compiled = compiled_configs.get(key)
+        if compiled is None:
+            config = deepcopy(settings.LOGGING)
+            # we merge the loggers and handlers into the default config
+            config['loggers'] = self.create_loggers(self.config.get('loggers', {}))
+            config['handlers'] = self.merge_handlers(config.get('handlers', {}), self.config.get('handlers', {}))
+            canonical = self.canonicalize(config)
+            # the request rules are not given to the logging system, but they are part of the state
+            canonical['requests'] = self.config.get('requests', {})
+            canonical = json.dumps(canonical, sort_keys=True, default=repr)
+            compiled = (config, hashlib.sha256(canonical.encode('utf-8')).digest())
+            compiled_configs.set(key, compiled)
+        return compiled
+
+    @classmethod
+    def canonicalize(cls, config):
+        """
+        return a copy of the complete config with the levels and the implicit values of the loggers and
+        handlers written the same way.
+        :param dict config: the complete config
+        :rtype: dict
+        """
+        canonical = dict(config)
+        canonical['loggers'] = {
+            name: dict(cfg, level=cls.normalize_level(cfg.get('level')))
+            for name, cfg in config.get('loggers', {}).items()
+        }
+        canonical['handlers'] = {
+            name: dict(cfg, level=cls.normalize_level(cfg.get('level', logging.NOTSET)),
+                       filters=cfg.get('filters', []))
+            for name, cfg in config.get('handlers', {}).items()
+        }
+        return canonical
 
-    def _reset_logging(self):
+    @staticmethod
+    def normalize_level(level):
         """
-        reset all the handlers for all loggers.
+        return the numeric value of a level, or the level as is if it is not valid
+        """
+        try:
+            return logging._checkLevel(level)
+        except (ValueError, TypeError):
+            return level
+
+    def apply(self, trigger=None):
+        """
+        apply the current config to the global logging system.
+        only the loggers and handlers whose config differ from the currently applied one are updated.
         :return:
         """
-        for logger in self.get_existing_loggers().values():
-            logger.handlers = []
-            logger.filters = []
-            logger.propagate = True
+        config = self.get_logging_config()
+        module_logger.info("[%s] applying logging config %s", trigger, self)
+        if module_logger.isEnabledFor(logging.DEBUG):
+            module_logger.debug("applying config %s", json.dumps(config, default=repr))
+        main_applier.apply(config)
+        main_request_rules.apply(self.config.get('requests', {}))
+        config_applied.send(self.__class__, config=self)
 
     @staticmethod
     def create_loggers(partial_config):
@@ -210,18 +347,39 @@ class Config(models.Model):
         default_val = {'propagate': True, 'handlers': [],
                        'filters': [], 'level': 'INFO'}
 
+        # not used by the logging system, but by the applier (sample, rate_limit) and the db_debug_stream signal
+        extra_keys = ('sample', 'rate_limit', 'sql_slow_threshold', 'sql_sample_rate')
+
         res = {}
         for logger_name, logger_cfg in partial_config.items():
             current = res[logger_name] = {}
             current.update(default_val)
-            current.update({k: v for k, v in logger_cfg.items() if k in default_val.keys()})
+            current.update({k: v for k, v in logger_cfg.items() if k in default_val.keys() or k in extra_keys})
         return res
 
-    @staticmethod
-    def merge_handlers(settings_handlers, new_config):
+    @classmethod
+    def get_handler_keys(cls, handler_cfg):
+        """
+        return the keys of a handler that a config can update. the options of the flight recorders are
+        given only to the FlightRecorderHandlers: the other handlers would not accept them.
+        :param dict handler_cfg: the config of the handler in settings.LOGGING
+        :rtype: tuple
+        """
+        klass = handler_cfg.get('class')
+        if isinstance(klass, str):
+            try:
+                klass = import_string(klass)
+            except ImportError:
+                return cls.HANDLER_KEYS
+        if isinstance(klass, type) and issubclass(klass, FlightRecorderHandler):
+            return cls.HANDLER_KEYS + cls.RECORDER_KEYS
+        return cls.HANDLER_KEYS
+
+    @classmethod
+    def merge_handlers(cls, settings_handlers, new_config):
         """
         merge the handler config. it don't add new handler, and just
-        merge the level and the filters. nothing else
+        merge the level, the filters, the queue and the options of the flight recorders. nothing else
         :param settings_handlers:
         :param new_config:
         :return:
@@ -229,7 +387,8 @@ class Config(models.Model):
         res = deepcopy(settings_handlers)
         for handler_name, handler_cfg_res in res.items():
             expected_handler_cfg = new_config.get(handler_name, {})
-            handler_cfg_res.update({k: v for k, v in expected_handler_cfg.items() if k in ('filters', 'level')})
+            keys = cls.get_handler_keys(handler_cfg_res)
+            handler_cfg_res.update({k: v for k, v in expected_handler_cfg.items() if k in keys})
         return res
 
     def __str__(self):
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import logging
+from fnmatch import fnmatchcase
+
+WILDCARD = '*'
+
+
+def is_pattern(name):
+    """
+    return True if the logger name of a config is a pattern
+    """
+    return WILDCARD in name
+
+
+class _Node(object):
+    __slots__ = ('children', 'globs', 'pattern')
+
+    def __init__(self):
+        self.children = {}
+        self.globs = []
+        """
+        the (part, node) of the parts with a wildcard in them (ie: ``pay*``), the most specific first
+        """
+        self.pattern = None
+
+
+class LoggerPatternTrie(object):
+    """
+    the logger name patterns compiled into a trie of their dotted parts.
+
+    a ``*`` part match exactly one part of the logger name, except when it is the last part
+    of the pattern: it then match all the remaining parts. so ``myapp.payments.*`` match all the
+    loggers under ``myapp.payments``, and ``myapp.*.sql`` match ``myapp.payments.sql``. a part can also
+    be a glob, matched with fnmatch: ``myapp.pay*`` match ``myapp.payments`` and ``myapp.payouts``, and
+    all the loggers under them like a trailing ``*``.
+
+    matching a name walk the trie along its parts, so it cost O(depth of the name) instead
+    of O(number of patterns). if many patterns match, the most specific one win: at each part,
+    the exact part is preferred to the globs, and the globs to the wildcard.
+    """
+
+    def __init__(self, patterns=()):
+        self.root = _Node()
+        self.size = 0
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern):
+        node = self.root
+        for part in pattern.split('.'):
+            if WILDCARD in part and part != WILDCARD:
+                node = self._add_glob(node, part)
+            else:
+                node = node.children.setdefault(part, _Node())
+        node.pattern = pattern
+        self.size += 1
+
+    @staticmethod
+    def _add_glob(node, part):
+        for glob, child in node.globs:
+            if glob == part:
+                return child
+        child = _Node()
+        node.globs.append((part, child))
+        # the globs with the most fixed characters are the most specific
+        node.globs.sort(key=lambda glob_child: -len(glob_child[0].replace(WILDCARD, '')))
+        return child
+
+    def match(self, name):
+        """
+        return the most specific pattern matching the logger name, or None.
+        :param str name: the name of the logger
+        :rtype: str|None
+        """
+        return self._match(self.root, name.split('.'), 0)
+
+    def _match(self, node, parts, i):
+        if i == len(parts):
+            return node.pattern
+        child = node.children.get(parts[i])
+        if child is not None:
+            found = self._match(child, parts, i + 1)
+            if found is not None:
+                return found
+        for glob, child in node.globs:
+            if fnmatchcase(parts[i], glob):
+                found = self._match(child, parts, i + 1)
+                if found is not None:
+                    return found
+                # a trailing glob match all the remaining parts, like the wildcard
+                if child.pattern is not None:
+                    return child.pattern
+        wildcard = node.children.get(WILDCARD)
+        if wildcard is not None:
+            found = self._match(wildcard, parts, i + 1)
+            if found is not None:
+                return found
+            # a trailing wildcard match all the remaining parts
+            return wildcard.pattern
+        return None
+
+    def __len__(self):
+        return self.size
+
+
+class LoggerCreationHook(object):
+    """
+    call a function with each logger created by logging.getLogger, by wrapping the getLogger method
+    of the logging manager. the callback is called after the creation, out of the logging lock.
+    """
+
+    def __init__(self, callback, manager=None):
+        self.callback = callback
+        self.manager = manager or logging.Logger.manager
+        self.original = self.manager.getLogger
+        self.installed = False
+        self.chained = False
+        """
+        True while our get_logger is in the chain of the getLogger wrappers, even if we don't call back
+        """
+
+    def install(self):
+        if self.installed:
+            return
+        self.installed = True
+        if not self.chained:
+            self.original = self.manager.getLogger
+            self.manager.getLogger = self.get_logger
+            self.chained = True
+
+    def uninstall(self):
+        if not self.installed:
+            return
+        self.installed = False
+        self.unchain()
+
+    def unchain(self):
+        """
+        remove our get_logger from the chain of the getLogger wrappers, if we are the last one
+        """
+        if self.manager.__dict__.get('getLogger') != self.get_logger:
+            # someone else wrapped getLogger after us: we only stop calling back, and stay in the chain
+            return
+        original = self.original
+        if getattr(original, '__func__', None) is type(self.manager).getLogger:
+            del self.manager.getLogger
+        else:
+            self.manager.getLogger = original
+        self.chained = False
+        previous = getattr(original, '__self__', None)
+        if isinstance(previous, LoggerCreationHook) and not previous.installed:
+            # the hook we wrapped was uninstalled meanwhile: it can leave the chain now
+            previous.unchain()
+
+    def get_logger(self, name):
+        previous = self.manager.loggerDict.get(name)
+        created = self.original(name)
+        if created is not previous and self.installed:
+            self.callback(created)
+        return created
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+import logging
+import random
+import threading
+
+from dynamic_logging.patterns import LoggerCreationHook
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # pragma: nocover
+    ContextVar = None
+
+logger = logging.getLogger(__name__)
+
+SELECTORS = ('header', 'value', 'user_id', 'path_prefix', 'sample')
+"""
+the keys of a request rule that select the requests it match
+"""
+
+
+class LocalVar(object):
+    """
+    a stand-in of ContextVar for python < 3.7, local to each thread
+    """
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self.default = default
+        self.local = threading.local()
+
+    def get(self):
+        return getattr(self.local, 'value', self.default)
+
+    def set(self, value):
+        token = self.get()
+        self.local.value = value
+        return token
+
+    def reset(self, token):
+        self.local.value = token
+
+
+current_rules = (ContextVar or LocalVar)('dynamic_logging_request_rules', default=())
+"""
+the names of the request rules matched by the current request
+"""
+
+
+class RequestRule(object):
+    """
+    a rule of the `requests` section of a config: the loggers to lower the level of, and the selectors of
+    the requests it apply to. all the given selectors must match:
+
+    - header: the name of a http header the request must have. with `value`, the header must be equal to it
+    - user_id: the pk (or the list of pk) of the authenticated user
+    - path_prefix: the start of the path of the request
+    - sample: the part of the requests to match, from 0 to 1
+    """
+
+    def __init__(self, name, cfg):
+        self.name = name
+        self.loggers = {
+            logger_name: logging._checkLevel(level) for logger_name, level in cfg.get('loggers', {}).items()
+        }
+        header = cfg.get('header')
+        self.header = header and 'HTTP_' + header.upper().replace('-', '_')
+        self.value = cfg.get('value')
+        user_id = cfg.get('user_id')
+        self.user_ids = None if user_id is None else set(user_id if isinstance(user_id, list) else [user_id])
+        self.path_prefix = cfg.get('path_prefix')
+        self.sample = cfg.get('sample')
+
+    def match(self, request):
+        """
+        return True if the request match all the selectors of this rule
+        :param django.http.HttpRequest request: the current request
+        """
+        if self.header is not None:
+            value = request.META.get(self.header)
+            if value is None or (self.value is not None and value != self.value):
+                return False
+        if self.path_prefix is not None and not request.path.startswith(self.path_prefix):
+            return False
+        if self.user_ids is not None:
+            user = getattr(request, 'user', None)
+            if user is None or user.pk not in self.user_ids:
+                return False
+        if self.sample is not None and random.random() >= self.sample:
+            return False
+        return True
+
+    def get_level(self, logger_name):
+        """
+        return the level given by this rule to the logger, inherited from its nearest configured parent
+        :rtype: int|None
+        """
+        name = logger_name
+        while True:
+            if name in self.loggers:
+                return self.loggers[name]
+            if '.' not in name:
+                return None
+            name = name.rsplit('.', 1)[0]
+
+
+class RequestRules(object):
+    """
+    the request rules of the applied config.
+
+    the loggers of the rules, and their children, get their isEnabledFor replaced by one that also
+    accept the levels of the rules matched by the current request (see RequestLoggingMiddleware). the children
+    created after the application are patched at their creation. the level
+    of the loggers is not changed: the requests that match no rule keep the cheap short-circuit of the
+    logging system, and pay only one lookup of the context variable for these loggers.
+    the handlers of these loggers must accept the lowered level.
+    """
+
+    def __init__(self):
+        # the loggers created by getLogger while the rules are applied call back in the same thread
+        self._lock = threading.RLock()
+        self.config = {}
+        self.rules = []
+        self.patched = set()
+        self.creation_hook = LoggerCreationHook(self.on_logger_created)
+
+    def apply(self, config):
+        """
+        replace the current rules by the ones of the config
+        :param dict config: the `requests` section of the config: rule name => rule config
+        """
+        with self._lock:
+            if config == self.config:
+                return
+            self.unpatch()
+            self.rules = [RequestRule(name, cfg) for name, cfg in sorted(config.items())]
+            self.config = config
+            # hooked before the existing loggers are listed, to not miss the ones created meanwhile
+            if self.rules:
+                self.creation_hook.install()
+            else:
+                self.creation_hook.uninstall()
+            names = {name for rule in self.rules for name in rule.loggers}
+            existing = [
+                name for name, obj in list(logging.Logger.manager.loggerDict.items())
+                if isinstance(obj, logging.Logger)
+            ]
+            for logger_name in sorted(names | {n for n in existing if any(n.startswith(p + '.') for p in names)}):
+                self.patch(logging.getLogger(logger_name), self.get_levels(logger_name))
+            if self.rules:
+                logger.info("request rules %s applied", ', '.join(rule.name for rule in self.rules))
+
+    def get_levels(self, logger_name):
+        """
+        return the levels given to the logger by the rules
+        :rtype: dict
+        """
+        levels = {}
+        for rule in self.rules:
+            level = rule.get_level(logger_name)
+            if level is not None:
+                levels[rule.name] = level
+        return levels
+
+    def on_logger_created(self, created):
+        """
+        patch a newly created logger if it is one of the loggers of the rules, or one of their children
+        :param logging.Logger created: the new logger
+        """
+        with self._lock:
+            levels = self.get_levels(created.name)
+            if levels:
+                self.patch(created, levels)
+
+    def patch(self, target, levels):
+        if target in self.patched:
+            return
+        original = target.isEnabledFor
+
+        def isEnabledFor(level):
+            if original(level):
+                return True
+            for rule in current_rules.get():
+                rule_level = levels.get(rule)
+                if rule_level is not None and level >= rule_level:
+                    return True
+            return False
+
+        target.isEnabledFor = isEnabledFor
+        self.patched.add(target)
+
+    def unpatch(self):
+        for target in self.patched:
+            target.__dict__.pop('isEnabledFor', None)
+        self.patched = set()
+
+    def match(self, request):
+        """
+        return the names of the rules matched by the request
+        :rtype: tuple
+        """
+        return tuple(rule.name for rule in self.rules if rule.match(request))
+
+
+main_request_rules = RequestRules()
@@ -1,16 +1,146 @@
 # -*- coding: utf-8 -*-
 import functools
+import heapq
+import itertools
 import logging
 import threading
+import time
 
+from django.db import close_old_connections
 from django.db.utils import ProgrammingError
 from django.utils import timezone
 
+from dynamic_logging.index import TriggerIndex
 from dynamic_logging.models import Trigger
 
 logger = logging.getLogger(__name__)
 
 
+class ScheduledCall(object):
+    """
+    a call registered in a TimerQueue. it has the same cancel() method as a threading.Timer.
+    """
+
+    def __init__(self, queue, deadline, function, name=None):
+        self.queue = queue
+        self.deadline = deadline
+        """
+        the time.monotonic() value at which the call is due
+        """
+        self.function = function
+        self.name = name
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        cancel the call. it stay in the queue until its deadline or the next compaction.
+        """
+        if not self.cancelled:
+            self.cancelled = True
+            self.queue.on_cancel()
+
+    def __repr__(self):
+        return '<ScheduledCall %s in %.3fs>' % (self.name, self.deadline - time.monotonic())
+
+
+class TimerQueue(object):
+    """
+    call functions after a delay, like threading.Timer, but from one long lived thread which wait
+    on a min heap of the deadlines. the thread is started at the first call, and restarted if it
+    died (ie: after a fork).
+
+    the cancelled calls are left in the heap and skipped when due. the heap is compacted when they
+    become the majority.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._cond = threading.Condition(threading.RLock())
+        self._heap = []
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._thread = None
+        self.drift_stats = {'count': 0, 'total': 0., 'max': 0., 'last': None}
+        """
+        the lateness in seconds of the calls made by the thread, compared to their deadline
+        """
+
+    def call_later(self, delay, function, *args, **kwargs):
+        """
+        call the function with the given arguments in delay seconds
+        :param float delay: the delay in seconds. a negative delay is the same as 0
+        :rtype: ScheduledCall
+        """
+        call = ScheduledCall(self, time.monotonic() + max(delay, 0), functools.partial(function, *args, **kwargs),
+                             name=getattr(function, '__name__', None))
+        with self._cond:
+            heapq.heappush(self._heap, (call.deadline, next(self._counter), call))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name)
+                self._thread.daemon = True
+                self._thread.start()
+            elif self._heap[0][2] is call:
+                # the thread wait for a later deadline
+                self._cond.notify()
+        return call
+
+    def on_cancel(self):
+        with self._cond:
+            self._cancelled += 1
+            if self._cancelled > len(self._heap) // 2:
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def __len__(self):
+        """
+        the number of calls waiting, cancelled or not
+        """
+        return len(self._heap)
+
+    def get_drift_stats(self):
+        """
+        return the number of calls made, and the mean, max and last lateness of the calls in seconds
+        :rtype: dict
+        """
+        stats = dict(self.drift_stats)
+        stats['mean'] = stats['total'] / stats['count'] if stats['count'] else None
+        return stats
+
+    def _next_call(self):
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled = max(self._cancelled - 1, 0)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay <= 0:
+                    return heapq.heappop(self._heap)[2]
+                self._cond.wait(min(delay, threading.TIMEOUT_MAX))
+
+    def _run(self):
+        while True:
+            call = self._next_call()
+            drift = time.monotonic() - call.deadline
+            stats = self.drift_stats
+            stats['count'] += 1
+            stats['total'] += drift
+            stats['max'] = max(stats['max'], drift)
+            stats['last'] = drift
+            # the thread never exit: its database connection is handled like the one of a request, so a
+            # connection broken by a restart of the database or an idle timeout is replaced by the next call
+            close_old_connections()
+            try:
+                call.function()
+            except Exception:
+                logger.exception("error in the scheduled call %s", call.name)
+            finally:
+                close_old_connections()
+
+
 class Scheduler(object):
     """
     a special class that keep trace of the next event to trigger and
@@ -20,7 +150,12 @@ class Scheduler(object):
     def __init__(self):
         self.next_timer = None
         """
-        :type: threading.Timer
+        the call of the next wake, with the trigger to enable and the date of the wake
+        :type: ScheduledCall
+        """
+        self.timers = TimerQueue('DynamicLoggingScheduler')
+        """
+        the queue of the wakes and defered reloads, processed by a single thread
         """
         self._lock = threading.RLock()
         self._enabled = True
@@ -29,6 +164,11 @@ class Scheduler(object):
         :type: Trigger
         """
         self.current_config_hash = None
+        self.index = None
+        """
+        the in memory index of the triggers, loaded at the first need and dropped at each reload
+        :type: TriggerIndex
+        """
 
         self.start_thread = True
         """
@@ -38,6 +178,10 @@ class Scheduler(object):
         """
         the local timer for the defered reload
         """
+        self.reload_callbacks = []
+        """
+        the functions to call once the defered reload is done
+        """
         self.trigger_applied = threading.Event()
         """
         a simple Event used to test each time a trigger is applied
@@ -65,8 +209,19 @@ class Scheduler(object):
     def is_enabled(self):
         return self._enabled
 
-    @staticmethod
-    def get_next_wake(current=None, after=None):
+    def get_index(self, date):
+        """
+        return the index of the triggers, loaded from the database if it does not cover the given date
+        :param datetime.datetime date: the first date the index will be used for
+        :rtype: TriggerIndex
+        :raise ProgrammingError: if the tables don't exist
+        """
+        index = self.index
+        if index is None or not index.covers(date):
+            index = self.index = TriggerIndex.load(date)
+        return index
+
+    def get_next_wake(self, current=None, after=None):
         """
         function that return the next trigger to apply and the date at which it may occure
 
@@ -77,66 +232,35 @@ class Scheduler(object):
         :rtype: (Trigger, datetime.datetime)
         """
         after = after or timezone.now()
-        # next wake is the earliest of :
-        # - the end of the current one
-        # - the start of a new one
-
+        since = after
+        if current is not None and current.end_date is not None:
+            since = min(since, current.end_date)
         try:
-            next_trigger = Trigger.objects.filter(is_active=True, start_date__gt=after).earliest('start_date')
-        except Trigger.DoesNotExist:
-            # no next trigger
-            next_trigger = None  # type: Trigger
+            index = self.get_index(since)
         except ProgrammingError:
-            next_trigger = None
-
-        # boolean opperation is
-        # w = current trigger is null
-        # x = current trigger's end date is null =>_trigger don't end
-        # y = no next trigger
-        # z = current trigger end befor the next one start
-
-        # results are
-        # a = activate next trigger at next trigger start date
-        # b = find best trigger at current one end date
-        # c = no trigger
-
-        # boolean simplification lead to:
-        # c = y and not b
-        # a = not y and not b
-        # b = not w and not x and (y or (not y and z))
-
-        # start with b case => find best trigger at the end of the current one
-        if (
-            current is not None  # not w
-            and current.end_date is not None  # not x
-            and (next_trigger is None or current.end_date < next_trigger.start_date)
-        ):
-            # b =>
-            try:
-                last_active = Trigger.objects.filter(is_active=True).valid_at(current.end_date).earliest('start_date')
-            except Trigger.DoesNotExist:
-                # no trigger active at the end of the current one, the default will be enabled
-                last_active = Trigger.default()
-            return last_active, current.end_date
-        elif next_trigger is None:  # case c = not b and y
-            return current or Trigger.default(), None
-        else:  # case a (last case)
-            return next_trigger, next_trigger.start_date
+            index = TriggerIndex([])
+        return index.get_next_wake(current, after)
 
     def set_next_wake(self, trigger, at):
         logger.debug("next trigger to enable : %s at %s", trigger, at, extra={'next_date': at})
         with self._lock:
             self.reset_timer()
             interval = (at - timezone.now()).total_seconds()
-            self.next_timer = threading.Timer(interval,
-                                              functools.partial(self.wake, trigger=trigger, date=at))
-            self.next_timer.name = 'ApplyTimer for %s' % trigger.pk
-            self.next_timer.daemon = True  # prevent program hanging until netx trigger
+            if self.start_thread:
+                self.next_timer = self.call_later(interval, self.wake, trigger=trigger, date=at)
+            else:
+                # in some tests, we skip the overload of scheduling the wake for nothing.
+                self.next_timer = ScheduledCall(self.timers, None, functools.partial(self.wake, trigger, at))
+            self.next_timer.name = 'wake for %s' % trigger.pk
             self.next_timer.trigger = trigger
             self.next_timer.at = at
-            if self.start_thread:
-                # in some tests, we skip the overload of starting thread for nothing.
-                self.next_timer.start()
+
+    def call_later(self, delay, function, *args, **kwargs):
+        """
+        call the function in delay seconds from the scheduler thread
+        :rtype: ScheduledCall
+        """
+        return self.timers.call_later(delay, function, *args, **kwargs)
 
     def reset(self):
         """
@@ -165,15 +289,16 @@ class Scheduler(object):
         activate the current trigger
         :return:
         """
+        now = timezone.now()
         try:
-            t = Trigger.objects.filter(is_active=True).valid_at(timezone.now()).latest('start_date')
-        except Trigger.DoesNotExist:
-            self.apply(Trigger.default())
-            return None
+            t = self.get_index(now).current(now)
         except ProgrammingError:
             logger.info('the django-dynamic-logging tables don\'t exists: fall back to normal logging')
             self.apply(Trigger.default())
             return None
+        if t is None:
+            self.apply(Trigger.default())
+            return None
         try:
             self.apply(t)
             return t
@@ -182,25 +307,29 @@ class Scheduler(object):
                              t.id, t.config_id, str(e))
             return None
 
-    def reload(self, interval=None):
+    def reload(self, interval=None, index=None, callback=None):
         """
         cancel the timer and the next trigger, and
         compute the next one. can be done after an interval to delay the setup for some time.
+        :param TriggerIndex index: the up to date index of the triggers, if it is already known (ie: from a
+                                   snapshot shared by another process). if not, it is loaded from the database
+        :param callback: a function called once the config is applied. the callbacks of the defered reloads
+                         merged together are all called
         :return:
         """
         if self._enabled:
             with self._lock:
+                if callback is not None:
+                    self.reload_callbacks.append(callback)
                 if self.reload_timer is not None:
                     self.reload_timer.cancel()
                 if interval is not None:
-                    self.reload_timer = t = threading.Timer(interval, self.reload)
-                    t.name = "ReloadTimer"
-                    t.daemon = True
-                    t.start()
-                    self.reload_timer = t
+                    self.reload_timer = self.call_later(interval, self.reload)
                     return
 
                 self.reset_timer()
+                # the triggers may have changed since the index was loaded
+                self.index = index
                 current = self.activate_current()
                 trigger, at = self.get_next_wake(current=current)
                 if at:
@@ -208,6 +337,12 @@ class Scheduler(object):
                 else:
                     # no date to wake. we apply now this trigger and so be it
                     self.apply(trigger)
+                callbacks, self.reload_callbacks = self.reload_callbacks, []
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("error in the reload callback %s", callback)
 
     def wake(self, trigger, date):
         """
@@ -227,7 +362,7 @@ class Scheduler(object):
                 self.set_next_wake(next_trigger, at)
 
     def apply(self, trigger):
-        hash_config = trigger.config.get_hash()
+        hash_config = trigger.config.get_effective_hash()
         if self.current_config_hash == hash_config:
             logger.debug("not applying currently active config %s", trigger,
                          extra={'trigger': trigger, 'config': trigger.config.config_json})
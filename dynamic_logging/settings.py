@@ -8,7 +8,9 @@ logger = logging.getLogger(__name__)
 
 DEFAULT_VALUES = {
     "signals_auto":  ('db_debug',),  # setup all automatic signal handlers
-    "upgrade_propagator": {'class': "dynamic_logging.propagator.ThreadSignalPropagator", 'config': {}}
+    "upgrade_propagator": {'class': "dynamic_logging.propagator.ThreadSignalPropagator", 'config': {}},
+    "compiled_cache_size": 32,  # number of complete logging configs kept in memory
+    "metrics_hook": None,  # path of a callable(name, value, tags) called with each recorded metric
 }
 
 
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 import logging
+import random
+import time
 
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
 from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
 from django.dispatch.dispatcher import Signal
 
 logger = logging.getLogger(__name__)
@@ -18,6 +22,84 @@ triggered each time a config is applied
 """
 
 
+def get_db_level(config):
+    """
+    return the level of django.db.backends in the given config
+    :param dynamic_logging.models.Config config: the applied config
+    :rtype: int
+    """
+    lvl = config.config.get('loggers', {}).get('django.db.backends', {}).get('level', 'ERROR')
+    if not isinstance(lvl, int):
+        lvl = getattr(logging, lvl, 50)
+    return lvl
+
+
+class SqlStream(object):
+    """
+    an execute wrapper that log the sql queries to django.db.backends as the CursorDebugWrapper do, but
+    without keeping them in connection.queries. it is installed on each connection, and log only while
+    django.db.backends is in debug and the connection does not use the CursorDebugWrapper.
+
+    the config of django.db.backends can have two more keys:
+
+    - sql_slow_threshold: log only the queries that last at least this number of seconds [default: 0]
+    - sql_sample_rate: log only this part of the queries, from 0 to 1 [default: 1]
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('django.db.backends')
+        self.options = None
+        """
+        (slow threshold, sample rate) while the queries are logged
+        """
+
+    def setup(self):
+        connection_created.connect(self.on_connection_created)
+        config_applied.connect(self.on_config_applied)
+        for connection in connections.all():
+            self.install(connection)
+
+    def teardown(self):
+        connection_created.disconnect(self.on_connection_created)
+        config_applied.disconnect(self.on_config_applied)
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        self.options = None
+
+    def install(self, connection):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def on_connection_created(self, sender, connection, **kwargs):
+        self.install(connection)
+
+    def on_config_applied(self, sender, config, **kwargs):
+        if get_db_level(config) <= logging.DEBUG:
+            logger.info("streaming the sql queries to django.db.backends")
+            cfg = config.config['loggers']['django.db.backends']
+            self.options = (float(cfg.get('sql_slow_threshold') or 0), float(cfg.get('sql_sample_rate', 1)))
+        else:
+            self.options = None
+
+    def __call__(self, execute, sql, params, many, context):
+        options = self.options
+        # the CursorDebugWrapper of the connections that keep their queries log them already
+        if options is None or context['connection'].queries_logged or (
+                options[1] < 1 and random.random() >= options[1]):
+            return execute(sql, params, many, context)
+        start = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.time() - start
+            if duration >= options[0]:
+                self.logger.debug(
+                    '(%.3f) %s; args=%s', duration, sql, params,
+                    extra={'duration': duration, 'sql': sql, 'params': params}
+                )
+
+
 class AutoSignalsHandler(object):
     extra_signals = {}
 
@@ -52,10 +134,7 @@ class AutoSignalsHandler(object):
             :param kwargs:
             :return:
             """
-            lvl = config.config.get('loggers', {}).get('django.db.backends', {}).get('level', 'ERROR')
-            if not isinstance(lvl, int):
-                lvl = getattr(logging, lvl, 50)
-            if lvl <= logging.DEBUG:
+            if get_db_level(config) <= logging.DEBUG:
                 logger.info("applying the fix for db_debug")
                 BaseDatabaseWrapper.queries_logged = True
             else:
@@ -63,3 +142,12 @@ class AutoSignalsHandler(object):
                 BaseDatabaseWrapper.queries_logged = old_cnx_queries_logged_property
 
         config_applied.connect(db_debug_handler, weak=False)
+
+    def db_debug_stream(self):
+        """
+        an alternative to db_debug: log the sql queries if django.db.backends is in debug, without
+        accumulating them in connection.queries (see SqlStream)
+        :return:
+        """
+        self.sql_stream = SqlStream()
+        self.sql_stream.setup()
@@ -24,7 +24,10 @@ function load_form(json) {
     handler.name = handlername;
     handlers.push(handler);
   });
-  return {'loggers': loggers, 'handlers': handlers}
+  delete data.loggers;
+  delete data.handlers;
+  // the other sections (ie: requests) are not editable here, but must be kept
+  return {'loggers': loggers, 'handlers': handlers, 'others': data}
 }
 
 /**
@@ -46,7 +49,23 @@ function dump_form(data) {
     delete handler.name;
     handlers[lname] = handler;
   });
-  return JSON.stringify({'loggers': loggers, 'handlers': handlers});
+  return JSON.stringify($.extend({}, data.others, {'loggers': loggers, 'handlers': handlers}));
+}
+
+/**
+ * parse the sample rate of a logger: a number from 0 to 1, or a json object of rates by level
+ * @param value the text typed by the user
+ * @returns the rate to put in the config, or undefined if there is none
+ */
+function parse_sample(value) {
+  value = $.trim(value);
+  if (value === '') {
+    return undefined;
+  }
+  if (!isNaN(value)) {
+    return parseFloat(value);
+  }
+  return JSON.parse(value);
 }
 
 function logging_widget(anchor, data, extra_select) {
@@ -146,6 +165,31 @@ function logging_widget(anchor, data, extra_select) {
         },
         "#handlers": "handlers",
         "#filters": "filters",
+        "#sample": {
+          bind: function (d, v) {
+            if (v !== null) {
+              try {
+                d.sample = parse_sample(v);
+              } catch (e) {
+                // keep the previous value while the json is being typed
+              }
+              if (d.sample === undefined) {
+                delete d.sample;
+              }
+            }
+            if (d.sample === undefined) {
+              return '';
+            }
+            return (typeof d.sample === 'number') ? String(d.sample) : JSON.stringify(d.sample);
+          },
+          check: function (data, value) {
+            try {
+              parse_sample(value);
+            } catch (e) {
+              return "the sample must be a rate from 0 to 1, or a json like {\"INFO\": 0.01}";
+            }
+          }
+        },
         "#btn-removeRow": {
           bind: function (d, v) {
             if (v != null) this.my.remove();
@@ -162,7 +206,8 @@ function logging_widget(anchor, data, extra_select) {
     '  <div class="flex-container" >' +
     '     <table>' +
     '       <thead><tr>' +
-    '         <th>name</th><th>level</th><th>propagate</th><th>handler</th><th>filter</th><th>remove</th>' +
+    '         <th>name</th><th>level</th><th>propagate</th><th>handler</th><th>filter</th><th>sample</th>' +
+    '         <th>remove</th>' +
     '       </tr></thead>' +
     '       <tbody id="loggers"></tbody>' +
     '     </table>' +
@@ -200,6 +245,7 @@ function logging_widget(anchor, data, extra_select) {
       return '    <option value="' + val + '">' + val + '</option>';
     }).join() +
     '  </select></td>' +
+    '  <td><input id="sample" type="text" placeholder="1" size="8"/><br /><span class="my-error-tip"></span></td>' +
     '  <td><span id="btn-removeRow" style="cursor:pointer; color: red;">X</span></td>' +
     ''
   };
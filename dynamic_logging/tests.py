@@ -1,24 +1,49 @@
 # -*- coding: utf-8 -*-
 import datetime
 import doctest
+import functools
 import json
 import logging.config
+import os
+import queue
+import shutil
+import sys
+import tempfile
 import threading
 import time
-from unittest.case import SkipTest
+from copy import deepcopy
+from io import StringIO
+from unittest import mock
+from unittest.case import SkipTest, skipIf
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
-from django.test.testcases import TestCase
+from django.core.management import call_command
+from django.db import connection as db_connection
+from django.db import transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.test.client import RequestFactory
+from django.test.testcases import TestCase, TransactionTestCase
 from django.test.utils import override_settings
 from django.utils import timezone
 
-from dynamic_logging.handlers import MockHandler
-from dynamic_logging.models import Config, Trigger
-from dynamic_logging.propagator import AmqpPropagator, TimerPropagator
-from dynamic_logging.scheduler import Scheduler, main_scheduler
+from dynamic_logging.applier import main_applier
+from dynamic_logging.cache import LRUCache
+from dynamic_logging.filters import RateLimitFilter, SamplingFilter
+from dynamic_logging.handlers import FlightRecorderHandler, MockHandler, QueuedHandler
+from dynamic_logging.index import TriggerIndex
+from dynamic_logging.metrics import Histogram, Metrics, main_metrics
+from dynamic_logging.middleware import RequestLoggingMiddleware
+from dynamic_logging.models import Config, Trigger, compiled_configs
+from dynamic_logging.patterns import LoggerPatternTrie
+from dynamic_logging.propagator import (AmqpPropagator, CachePropagator, MmapPropagator, Propagator, RepeatTimer,
+                                        TimerPropagator)
+from dynamic_logging.request_scope import main_request_rules
+from dynamic_logging.scheduler import Scheduler, TimerQueue, main_scheduler
 from dynamic_logging.signals import AutoSignalsHandler
 from dynamic_logging.templatetags.dynamic_logging import display_config, getitem
+from dynamic_logging.timeline import simulate
+from dynamic_logging.widgets import JsonLoggerWidget
 
 
 def load_tests(loader, tests, ignore):
@@ -92,10 +117,129 @@ class SchedulerTest(TestCase):
         self.assertTriggerForDate('17-02-2017', 'default settings', None)
         self.assertTriggerForDate('27-02-2017', 'default settings', None)
 
+    def test_next_wake_from_index(self):
+        current = Trigger.objects.get(name='5')
+        with self.assertNumQueries(1):
+            t, next_w = self.scheduler.get_next_wake(current=current, after=get_tz_date('06-02-2017'))
+            # the config was fetched with the trigger
+            self.assertEqual(t.config.name, 'nothing logged')
+        self.assertEqual((t.name, next_w), ('3', get_tz_date('13-02-2017')))
+        # the following wakes are answered by the index
+        with self.assertNumQueries(0):
+            self.assertTriggerForDate('15-02-2017', '6', '16-02-2017')
+        # a date before the loaded window reload the index
+        with self.assertNumQueries(1):
+            self.assertTriggerForDate('01-01-2017', '1', '11-01-2017')
+        # the index is reloaded at each reload of the scheduler
+        index = self.scheduler.index
+        self.scheduler.reload()
+        self.assertIsNot(self.scheduler.index, index)
+
+    def test_index_current(self):
+        index = TriggerIndex.load()
+        self.assertEqual(len(index), 7)
+        self.assertIsNone(index.current(get_tz_date('01-01-2017')))
+        self.assertEqual(index.current(get_tz_date('06-02-2017')).name, '5')
+        self.assertEqual(index.earliest_valid(get_tz_date('06-02-2017')).name, '3')
+        self.assertEqual(index.current(get_tz_date('10-02-2017')).name, '5')
+        self.assertEqual(index.current(get_tz_date('13-02-2017')).name, '3')
+        self.assertIsNone(index.current(get_tz_date('14-02-2017')))
+        self.assertEqual(index.next_start(get_tz_date('14-02-2017')).name, '6')
+        self.assertIsNone(index.next_start(get_tz_date('16-02-2017')))
+        Trigger.objects.create(name='forever', start_date=None, end_date=None, config=Config.objects.get())
+        index = TriggerIndex.load(get_tz_date('01-02-2017'))
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index.current(get_tz_date('14-02-2017')).name, 'forever')
+        self.assertEqual(index.earliest_valid(get_tz_date('06-02-2017')).name, 'forever')
+
+    def test_timeline(self):
+        with self.assertNumQueries(1):
+            events = simulate(get_tz_date('01-01-2017'), get_tz_date('01-03-2017'))
+        self.assertEqual(
+            [(e.date, e.trigger.name, e.applied) for e in events],
+            [(get_tz_date(d), n, a) for d, n, a in [
+                ('01-01-2017', 'default settings', True),
+                ('11-01-2017', '1', True),
+                ('12-01-2017', '2', False),
+                ('14-01-2017', 'default settings', True),
+                ('01-02-2017', '3', True),
+                ('03-02-2017', '4', False),
+                ('05-02-2017', '5', False),
+                ('13-02-2017', '3', False),
+                ('14-02-2017', 'default settings', True),
+                ('16-02-2017', '6', True),
+                ('25-02-2017', 'default settings', True),
+            ]]
+        )
+        self.assertEqual(len(simulate(get_tz_date('01-01-2017'), get_tz_date('13-01-2017'))), 3)
+        out = StringIO()
+        call_command('dynamic_logging_timeline', start='2017-02-01T00:00:00', days=14, stdout=out)
+        # 3 enabled at 01-02, then the default at 14-02
+        self.assertEqual(out.getvalue().count('\n'), 2)
+        out = StringIO()
+        call_command('dynamic_logging_timeline', start='2017-02-01T00:00:00', days=14, show_all=True, stdout=out)
+        self.assertEqual(out.getvalue().count('(unchanged)'), 3)
+
+    def test_timeline_in_memory(self):
+        config = Config(name='in memory')
+        start = get_tz_date('01-01-2017')
+        triggers = [
+            Trigger(name='%d' % i, config=config,
+                    start_date=start + datetime.timedelta(hours=i),
+                    end_date=start + datetime.timedelta(hours=i + 1 + i % 7))
+            for i in range(20000)
+        ]
+        with self.assertNumQueries(0):
+            events = simulate(start, start + datetime.timedelta(days=1000), triggers)
+        self.assertGreater(len(events), 20000)
+        self.assertEqual(events[-1].trigger.name, 'default settings')
+        dates = [e.date for e in events]
+        self.assertEqual(dates, sorted(set(dates)))
+
+
+class TimerQueueTest(TestCase):
+    def test_calls_in_order(self):
+        queue = TimerQueue('test queue')
+        called = []
+        done = threading.Event()
+        queue.call_later(0.1, done.set)
+        queue.call_later(0.05, called.append, 'second')
+        cancelled = queue.call_later(0.04, called.append, 'cancelled')
+        # the thread must be notified that an earlier call is waiting
+        queue.call_later(0.01, called.append, 'first')
+        cancelled.cancel()
+        threads = [t for t in threading.enumerate() if t.name == 'test queue']
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(done.wait(2))
+        self.assertEqual(called, ['first', 'second'])
+        stats = queue.get_drift_stats()
+        self.assertEqual(stats['count'], 3)
+        self.assertGreaterEqual(stats['max'], 0)
+        self.assertEqual(len(queue), 0)
+
+    def test_close_old_connections(self):
+        queue = TimerQueue('test connections')
+        done = threading.Event()
+        with mock.patch('dynamic_logging.scheduler.close_old_connections') as close_old_connections:
+            queue.call_later(0, lambda: None)
+            queue.call_later(0.01, done.set)
+            self.assertTrue(done.wait(2))
+            # the connection of the thread is checked before and after each call, like for a request
+            self.assertGreaterEqual(close_old_connections.call_count, 3)
+
+    def test_compaction(self):
+        queue = TimerQueue('test compaction')
+        calls = [queue.call_later(3600, lambda: None) for _ in range(10)]
+        for call in calls[:6]:
+            call.cancel()
+        # the cancelled calls was dropped when they became the majority
+        self.assertEqual(len(queue), 4)
+
 
 @override_settings(
-    DYNAMIC_LOGGING={"upgrade_propagator": {'class': "dynamic_logging.propagator.ThreadSignalPropagator", 'config': {}}
-                     }
+    DYNAMIC_LOGGING={"upgrade_propagator": {'class': "dynamic_logging.propagator.ThreadSignalPropagator",
+                                            # the test transaction is never commited
+                                            'config': {'on_commit': False}}}
 )
 class TestSchedulerTimers(TestCase):
     def setUp(self):
@@ -276,7 +420,8 @@ class AmqpPropagatorTest(TestCase):
         # send a message wherever a Config/Trigger is created/updated
 
         # all this threading stuff is ugly... i know
-        propagator = AmqpPropagator({'url': self.amqp_url, 'echange_name': 'my_test_exchange'})
+        propagator = AmqpPropagator({'url': self.amqp_url, 'echange_name': 'my_test_exchange',
+                                     'on_commit': False})
 
         def fake_reload(*args, **kwargs):
             pass
@@ -363,6 +508,194 @@ class AmqpPropagatorTest(TestCase):
         propagator.teardown()
 
 
+class FakeBroker(object):
+    """
+    an in-process stand-in of a fanout broker, with the subset of the pika BlockingConnection api used
+    by AmqpPropagator. restart() drop all the connections and their queues, like a broker restart.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = True
+        self.bindings = {}
+        self.connections = []
+        self.published = 0
+
+    def connect(self):
+        with self.lock:
+            if not self.running:
+                raise IOError("connection refused")
+            connection = FakeConnection(self)
+            self.connections.append(connection)
+            return connection
+
+    def restart(self, down=0):
+        with self.lock:
+            self.running = False
+            connections, self.connections = self.connections, []
+            self.bindings = {}
+        for connection in connections:
+            connection.is_open = False
+            connection.events.put(None)
+        time.sleep(down)
+        self.running = True
+
+
+class FakeConnection(object):
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self.events = queue.Queue()
+
+    def channel(self):
+        return self
+
+    def check(self):
+        if not self.is_open:
+            raise IOError("connection lost")
+
+    def add_callback_threadsafe(self, callback):
+        self.events.put(callback)
+
+    def close(self):
+        self.is_open = False
+        self.events.put(None)
+
+    def exchange_declare(self, exchange, exchange_type):
+        self.check()
+
+    def queue_declare(self, queue, exclusive):
+        self.check()
+        return type('Result', (), {'method': type('Method', (), {'queue': str(id(self))})})
+
+    def queue_bind(self, exchange, queue):
+        self.check()
+        with self.broker.lock:
+            self.broker.bindings.setdefault(exchange, []).append(self)
+
+    def basic_consume(self, queue, on_message_callback, auto_ack):
+        self.callback = on_message_callback
+
+    def start_consuming(self):
+        while True:
+            self.check()
+            event = self.events.get()
+            if callable(event):
+                event()
+            elif event is not None:
+                self.callback(self, None, None, event)
+
+    def confirm_delivery(self):
+        self.check()
+
+    def basic_publish(self, exchange, routing_key, body):
+        self.check()
+        with self.broker.lock:
+            self.broker.published += 1
+            for connection in self.broker.bindings.get(exchange, []):
+                connection.events.put(body)
+
+
+class AmqpResilienceTest(TestCase):
+    def setUp(self):
+        self.broker = FakeBroker()
+        self.received = {}
+        self.propagators = []
+
+    def tearDown(self):
+        for propagator in self.propagators:
+            propagator.teardown()
+
+    def start(self, name):
+        propagator = AmqpPropagator({'connection_factory': self.broker.connect, 'reconnect_delay': 0.01,
+                                     'max_reconnect_delay': 0.05})
+        received = self.received[name] = []
+        propagator.reload_scheduler = lambda **kwargs: received.append(kwargs)
+        propagator.setup()
+        self.propagators.append(propagator)
+        return propagator
+
+    def wait_for(self, predicate, timeout=2):
+        deadline = time.time() + timeout
+        while not predicate():
+            self.assertLess(time.time(), deadline, "timeout")
+            time.sleep(0.005)
+
+    def wait_connected(self):
+        self.wait_for(lambda: sum(len(c) for c in self.broker.bindings.values()) == len(self.propagators))
+
+    def test_propagate(self):
+        sender, _ = self.start('sender'), self.start('receiver')
+        self.wait_connected()
+        sender.propagate()
+        self.wait_for(lambda: self.received['receiver'])
+        self.assertIn('index', self.received['receiver'][0])
+
+    def test_setup_dont_wait_for_broker(self):
+        self.broker.running = False
+        start = time.time()
+        sender = self.start('sender')
+        self.start('receiver')
+        self.assertLess(time.time() - start, 0.5)
+        # the message is kept until the broker is back
+        sender.propagate()
+        self.broker.running = True
+        self.wait_for(lambda: self.broker.published == 1)
+        # the receiver may have missed it: it reload from the database once connected
+        self.wait_for(lambda: self.received['receiver'])
+
+    def test_broker_restart(self):
+        sender, _ = self.start('sender'), self.start('receiver')
+        self.wait_connected()
+        self.broker.restart(down=0.05)
+        self.wait_connected()
+        # the receivers reload from the database after a reconnection: they may have missed a message
+        self.wait_for(lambda: {} in self.received['receiver'])
+        Config.objects.create(name="name", config_json='{}')
+        sender.propagate()
+        self.wait_for(lambda: 'index' in self.received['receiver'][-1])
+
+    def test_batch(self):
+        sender = self.start('sender')
+        for i in range(10):
+            sender.propagate()
+        self.wait_connected()
+        self.wait_for(lambda: self.received['sender'])
+        # the messages waiting in the outbox are published at once
+        self.assertLess(self.broker.published, 10)
+
+
+class AmqpMessageTest(TestCase):
+    def setUp(self):
+        config = Config.objects.create(name="name", config_json='{}')
+        Trigger.objects.create(name='lolilol', end_date=None, start_date=None, config=config)
+        self.reloads = []
+        self.receiver = AmqpPropagator({'jitter': 2})
+        self.receiver.reload_scheduler = lambda **kwargs: self.reloads.append(kwargs)
+
+    def test_message_with_snapshot(self):
+        body = AmqpPropagator({}).build_message()
+        with self.assertNumQueries(0):
+            self.receiver.on_message(None, None, None, body)
+        self.assertEqual(len(self.reloads), 1)
+        self.assertEqual(self.reloads[0]['index'].current(timezone.now()).name, 'lolilol')
+        # the same generation is skipped
+        self.receiver.on_message(None, None, None, body)
+        self.assertEqual(len(self.reloads), 1)
+
+    def test_message_without_snapshot(self):
+        body = AmqpPropagator({'max_snapshot_size': 10}).build_message()
+        self.assertIsNone(json.loads(body.decode('utf-8'))['snapshot'])
+        self.receiver.on_message(None, None, None, body)
+        # the receivers query the database after a random delay
+        self.assertNotIn('index', self.reloads[0])
+        self.assertTrue(0 <= self.reloads[0]['interval'] <= 2)
+        # a message without generation is never skipped
+        self.receiver.on_message(None, None, None, b'reload config trigered')
+        self.receiver.on_message(None, None, None, b'reload config trigered')
+        self.assertEqual(len(self.reloads), 3)
+
+
 @override_settings(
     DYNAMIC_LOGGING={"upgrade_propagator": {'class': "dynamic_logging.propagator.DummyPropagator", 'config': {}}}
 )
@@ -406,7 +739,296 @@ class TimerPropagatorTest(TestCase):
         t.delete()
         propagator.check_new_config()
         self.assertTrue(reload_called.isSet())
-        # teardown and check nothing changed
+        # a config used by a trigger
+        t = Trigger.objects.create(name='lolilol', end_date=None, start_date=None, config=config)
+        propagator.check_new_config()
+        reload_called.clear()
+        config.save()
+        with self.assertNumQueries(1):
+            propagator.check_new_config()
+        self.assertTrue(reload_called.isSet())
+        # nothing changed
+        reload_called.clear()
+        propagator.check_new_config()
+        self.assertFalse(reload_called.isSet())
+
+
+@override_settings(
+    DYNAMIC_LOGGING={"upgrade_propagator": {'class': "dynamic_logging.propagator.DummyPropagator", 'config': {}}}
+)
+class CachePropagatorTest(TestCase):
+
+    def test_generation_shared_by_processes(self):
+        local = CachePropagator({'key': 'test_generation'})
+        remote = CachePropagator({'key': 'test_generation', 'interval': 0.05})
+        reloaded = {'local': threading.Event(), 'remote': threading.Event()}
+        local.reload_scheduler = lambda **kwargs: reloaded['local'].set()
+        remote.reload_scheduler = lambda **kwargs: reloaded['remote'].set()
+        remote.setup()
+        try:
+            self.assertIsNone(remote.last_generation)
+            with self.assertNumQueries(0):
+                local.propagate()
+            # the process which made the change reload at once, the other one at its next check
+            self.assertTrue(reloaded['local'].is_set())
+            self.assertTrue(reloaded['remote'].wait(1))
+            self.assertEqual(remote.last_generation, 1)
+            local.propagate()
+            self.assertEqual(local.get_generation(), 2)
+            reloaded['local'].clear()
+            # nothing changed
+            with self.assertNumQueries(0):
+                local.check_generation()
+            self.assertFalse(reloaded['local'].is_set())
+        finally:
+            remote.teardown()
+            local.cache.delete('test_generation')
+
+
+@override_settings(
+    DYNAMIC_LOGGING={"upgrade_propagator": {'class': "dynamic_logging.propagator.DummyPropagator", 'config': {}}}
+)
+class MmapPropagatorTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.reloads = []
+        self.workers = []
+        for name in ('leader', 'follower'):
+            worker = MmapPropagator({'path': os.path.join(self.tmpdir, 'test.mmap'), 'size': 4096})
+            worker.reload_scheduler = functools.partial(self.reload_scheduler, name)
+            worker.open()
+            self.workers.append(worker)
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.close()
+        shutil.rmtree(self.tmpdir)
+
+    def reload_scheduler(self, name, index=None, changed_at=None):
+        self.reloads.append((name, index))
+
+    def test_leader_share_snapshot(self):
+        leader, follower = self.workers
+        self.assertTrue(leader.is_leader())
+        self.assertFalse(follower.is_leader())
+        config = Config.objects.create(name='shared')
+        Trigger.objects.create(name='shared', config=config, start_date=None, end_date=None)
+        leader.tick()
+        self.assertEqual(self.reloads[-1][0], 'leader')
+        # the follower reload from the snapshot, without querying the database
+        with self.assertNumQueries(0):
+            follower.tick()
+        name, index = self.reloads[-1]
+        self.assertEqual(name, 'follower')
+        self.assertEqual(index.current(timezone.now()).name, 'shared')
+        self.assertEqual(index.current(timezone.now()).config.config_json, config.config_json)
+        # nothing changed
+        del self.reloads[:]
+        leader.tick()
+        follower.tick()
+        self.assertEqual(self.reloads, [])
+
+        # a change made by the follower is reloaded at once by it, and by the others with the snapshot
+        follower.propagate()
+        self.assertEqual(self.reloads, [('follower', None)])
+        with self.assertNumQueries(0):
+            follower.tick()
+        self.assertEqual(len(self.reloads), 1)
+        leader.tick()
+        follower.tick()
+        self.assertEqual([name for name, index in self.reloads], ['follower', 'leader', 'follower'])
+        self.assertIsNotNone(self.reloads[-1][1])
+
+    def test_leader_takeover(self):
+        leader, follower = self.workers
+        self.assertTrue(leader.is_leader())
+        leader.close()
+        self.assertTrue(follower.is_leader())
+
+    def test_forked_leader(self):
+        leader, follower = self.workers
+        self.assertTrue(leader.is_leader())
+        leader.timer = inherited = RepeatTimer(3600, lambda: None)
+        inherited.start()
+        from_parent, to_child = os.pipe()
+        from_child, to_parent = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: nocover
+            status = 1
+            try:
+                os.close(from_child)
+                os.close(to_child)
+                # the lock still belong to the parent
+                status = 2 if leader.is_leader() else 3
+                # the child opened its own shared file, and run its own timer
+                if leader.pid == os.getpid() and leader.timer is not inherited and leader.timer.is_alive():
+                    status = 4
+                    # a change made in the child is written for the leader, which write the snapshot
+                    leader.propagate()
+                    leader.tick()
+                    if self.reloads == [('leader', None)] and leader.lock_fd is None:
+                        status = 0
+                os.write(to_parent, b'x')
+                # wait for the parent to check the lock while we live
+                os.read(from_parent, 1)
+            finally:
+                os._exit(status)
+        os.close(to_parent)
+        os.close(from_parent)
+        try:
+            os.read(from_child, 1)
+            # the generation written by the child is seen by the leader
+            leader.tick()
+            self.assertEqual(self.reloads[-1][0], 'leader')
+            self.assertIsNotNone(self.reloads[-1][1])
+            leader.close()
+            # the child did not keep the lock of its parent
+            self.assertTrue(follower.is_leader())
+        finally:
+            inherited.cancel()
+            os.write(to_child, b'x')
+            _, status = os.waitpid(pid, 0)
+            os.close(to_child)
+            os.close(from_child)
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+    def test_default_path(self):
+        path = MmapPropagator({}).path
+        self.assertTrue(path.startswith(tempfile.gettempdir()))
+        self.assertEqual(MmapPropagator({}).path, path)
+        with override_settings(SETTINGS_MODULE='otherproject.settings'):
+            self.assertNotEqual(MmapPropagator({}).path, path)
+
+    def test_snapshot_too_big(self):
+        leader, follower = self.workers
+        leader.is_leader()
+        config = Config.objects.create(name='big', config_json=json.dumps({'loggers': {
+            'logger%d' % i: {'level': 'DEBUG'} for i in range(200)
+        }}))
+        Trigger.objects.create(name='big', config=config, start_date=None, end_date=None)
+        leader.tick()
+        follower.tick()
+        # the follower must query the database
+        self.assertEqual(self.reloads[-1], ('follower', None))
+
+
+class CountingPropagator(Propagator):
+    def __init__(self, conf):
+        super(CountingPropagator, self).__init__(conf)
+        self.propagated = 0
+        self.called = threading.Event()
+
+    def propagate(self):
+        self.propagated += 1
+        self.called.set()
+
+
+class PropagatorCoalesceTest(TransactionTestCase):
+    def setUp(self):
+        self.config = Config.objects.create(name='coalesced')
+
+    def test_one_propagation_per_transaction(self):
+        propagator = CountingPropagator({})
+        propagator.setup()
+        try:
+            with transaction.atomic():
+                for i in range(5):
+                    Trigger.objects.create(name='%d' % i, config=self.config)
+                self.config.save()
+                self.assertEqual(propagator.propagated, 0)
+            self.assertEqual(propagator.propagated, 1)
+            # nothing is propagated for a rolled back transaction
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    Trigger.objects.update(is_active=False)
+                    Trigger.objects.first().save()
+                    raise ValueError()
+            self.assertEqual(propagator.propagated, 1)
+            # out of a transaction, the change is propagated at once
+            Trigger.objects.first().delete()
+            self.assertEqual(propagator.propagated, 2)
+        finally:
+            propagator.teardown()
+
+    def test_coalesce_window(self):
+        propagator = CountingPropagator({'on_commit': False, 'coalesce_window': 0.1})
+        propagator.setup()
+        try:
+            for i in range(5):
+                Trigger.objects.create(name='%d' % i, config=self.config)
+            self.assertEqual(propagator.propagated, 0)
+            self.assertTrue(propagator.called.wait(2))
+            self.assertEqual(propagator.propagated, 1)
+            self.assertIsNone(propagator.pending)
+        finally:
+            propagator.teardown()
+
+
+recorded_metrics = []
+
+
+def record_metric(name, value, tags):
+    recorded_metrics.append((name, value, tags))
+
+
+class MetricsTest(TestCase):
+    def test_histogram(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        for value in (0.0005, 0.003, 0.003, 0.2):
+            histogram.record(value)
+        self.assertEqual(histogram.count, 4)
+        # the upper bound of the buckets
+        self.assertEqual(histogram.percentile(50), 0.004)
+        self.assertEqual(histogram.percentile(100), 0.256)
+        summary = histogram.summary()
+        self.assertEqual(summary['max'], 0.2)
+        self.assertAlmostEqual(summary['mean'], 0.0516, places=4)
+
+    @override_settings(DYNAMIC_LOGGING={'metrics_hook': 'dynamic_logging.tests.record_metric'})
+    def test_hook(self):
+        metrics = Metrics()
+        del recorded_metrics[:]
+        metrics.record('save_to_apply', 0.5, propagator='TimerPropagator')
+        self.assertEqual(recorded_metrics, [('save_to_apply', 0.5, {'propagator': 'TimerPropagator'})])
+        self.assertEqual(metrics.get('save_to_apply', propagator='TimerPropagator').count, 1)
+        self.assertIsNone(metrics.get('save_to_apply'))
+
+
+@override_settings(
+    DYNAMIC_LOGGING={"upgrade_propagator": {'class': "dynamic_logging.propagator.ThreadSignalPropagator",
+                                            'config': {'on_commit': False}}}
+)
+class PropagationLatencyTest(TestCase):
+    def setUp(self):
+        main_metrics.reset()
+
+    def test_latency_recorded(self):
+        Config.objects.create(name='timed')
+        for name in ('receive_to_apply', 'save_to_apply'):
+            self.assertEqual(main_metrics.get(name, propagator='ThreadSignalPropagator').count, 1)
+
+    def test_deferred_reloads(self):
+        propagator = TimerPropagator({})
+        applied = threading.Event()
+        main_scheduler.reload(interval=60, callback=applied.set)
+        propagator.reload_scheduler(changed_at=time.time())
+        # the reload merged with the defered one call its callback too
+        self.assertTrue(applied.is_set())
+        self.assertEqual(main_metrics.get('save_to_apply', propagator='TimerPropagator').count, 1)
+
+    def test_timer_changed_at(self):
+        date = timezone.now()
+        signature = {'triggers': 1, 'trigger_update': date, 'config_update': None}
+        self.assertEqual(TimerPropagator.get_changed_at(signature, None), date.timestamp())
+        # a deletion don't change the last update
+        self.assertIsNone(TimerPropagator.get_changed_at(dict(signature, triggers=0), signature))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('dynamic_logging_latency', probes=2, interval=0, stdout=out)
+        self.assertIn('save_to_apply\tThreadSignalPropagator\t', out.getvalue())
+        self.assertFalse(Config.objects.filter(name='dynamic_logging latency probe').exists())
 
 
 class ConfigApplyTest(TestCase):
@@ -457,6 +1079,18 @@ class ConfigApplyTest(TestCase):
             {'handlers': {'added': {}}, 'loggers': {'console': {'level': 'CRITICAL'}}}
         )
 
+    def test_config_property_parsed_once(self):
+        config_json = '{"loggers": {"console": {"level": "CRITICAL"}}}'
+        c = Config(name='lol', config_json=config_json)
+        parsed = c.config
+        self.assertIs(c.config, parsed)
+        # shared with the other instances with the same content
+        self.assertIs(Config(name='other', config_json=config_json).config, parsed)
+        c.config_json = '{"loggers": {"console": {"level": "ERROR"}}}'
+        self.assertEqual(c.config['loggers']['console'], {'level': 'ERROR'})
+        c.config_json = config_json
+        self.assertIs(c.config, parsed)
+
     def test_config_property_getter_empty(self):
         c = Config(name='lol', config_json='')
         self.assertEqual(c.config, {})
@@ -510,6 +1144,236 @@ class ConfigApplyTest(TestCase):
             else:
                 self.assertEqual(logger.handlers, [])
 
+    def test_incremental_apply_keep_handlers(self):
+        logger = logging.getLogger('testproject.testapp')
+        devnull = [h for h in logger.handlers if h.name == 'devnull'][0]
+        stream = devnull.stream
+        cfg = Config(name='empty')
+        cfg.config = {
+            "loggers": {
+                "testproject.testapp": {"handlers": ["devnull"], "level": "WARNING"},
+                "testproject.added": {"handlers": ["null"], "level": "DEBUG"},
+            },
+            "handlers": {"devnull": {"level": "ERROR"}},
+        }
+        cfg.apply()
+        # the same handler was updated, not rebuilt
+        self.assertEqual(logger.handlers, [devnull])
+        self.assertIs(devnull.stream, stream)
+        self.assertEqual(devnull.level, logging.ERROR)
+        self.assertEqual(logger.level, logging.WARNING)
+        added = logging.getLogger('testproject.added')
+        self.assertEqual(added.level, logging.DEBUG)
+        self.assertEqual(len(added.handlers), 1)
+
+        Config.default().apply()
+        self.assertIs(devnull.stream, stream)
+        self.assertEqual(devnull.level, logging.INFO)
+        self.assertEqual(logger.level, logging.DEBUG)
+        # loggers no more configured are reset
+        self.assertEqual(added.level, logging.NOTSET)
+        self.assertEqual(added.handlers, [])
+
+    def test_full_apply_after_external_config(self):
+        self.assertFalse(main_applier.apply(main_applier.applied))
+        logging.config.dictConfig(settings.LOGGING)
+        self.assertTrue(main_applier.apply(main_applier.applied))
+        self.assertFalse(main_applier.apply(main_applier.applied))
+
+    def test_handler_pool_on_settings_change(self):
+        def get_handlers():
+            return {h.name: h for h in logging.getLogger('testproject.testapp').handlers}
+        cfg = Config(name='pooled')
+        cfg.config = {"loggers": {"testproject.testapp": {"handlers": ["devnull", "console"]}}}
+        cfg.apply()
+        before = get_handlers()
+        new_logging = deepcopy(settings.LOGGING)
+        new_logging['handlers']['console']['formatter'] = 'simple'
+        new_logging['handlers']['devnull']['level'] = 'WARNING'
+        with override_settings(LOGGING=new_logging):
+            cfg.apply()
+            after = get_handlers()
+            # the definition of console changed: it was rebuilt
+            self.assertIsNot(before['console'], after['console'])
+            # devnull was kept, with its new level
+            self.assertIs(before['devnull'], after['devnull'])
+            self.assertIsNotNone(after['devnull'].stream)
+            self.assertEqual(after['devnull'].level, logging.WARNING)
+        cfg.apply()
+        self.assertIs(get_handlers()['devnull'], before['devnull'])
+        self.assertEqual(before['devnull'].level, logging.INFO)
+
+    def test_no_record_lost_while_applying(self):
+        cfg_a = Config(name='a')
+        cfg_a.config = {"loggers": {
+            "testproject.testapp": {"handlers": ["mock"], "level": "WARNING"},
+            "testproject": {"handlers": ["null"], "level": "DEBUG"},
+        }}
+        cfg_b = Config(name='b')
+        cfg_b.config = {"loggers": {
+            "testproject.testapp": {"handlers": ["mock", "null"], "level": "INFO"},
+        }, "handlers": {"null": {"level": "ERROR"}}}
+        cfg_a.apply()
+        new_logging = deepcopy(settings.LOGGING)
+        new_logging['handlers']['console']['formatter'] = 'simple'
+        stop = threading.Event()
+        sent = []
+        received = []
+
+        def target():
+            testapp_logger = logging.getLogger('testproject.testapp')
+            with MockHandler.capture() as messages:
+                while not stop.is_set():
+                    testapp_logger.warning("message")
+                    sent.append(1)
+                received.extend(messages['warning'])
+
+        thr = threading.Thread(target=target)
+        thr.start()
+        try:
+            for _ in range(20):
+                cfg_b.apply()  # incremental
+                with override_settings(LOGGING=new_logging):
+                    cfg_a.apply()  # full
+                cfg_a.apply()  # full
+        finally:
+            stop.set()
+            thr.join()
+        self.assertGreater(len(sent), 0)
+        self.assertEqual(len(received), len(sent))
+
+    def test_level_only_change(self):
+        cfg = Config(name='levels')
+        cfg.config = {"loggers": {"testproject.testapp": {"handlers": ["mock"], "level": "WARNING"}}}
+        cfg.apply()
+        child = logging.getLogger('testproject.testapp.child')
+        self.assertFalse(child.isEnabledFor(logging.INFO))
+        handler, = logging.getLogger('testproject.testapp').handlers
+        incremental = main_applier.stats['incremental']
+        cfg.config = {"loggers": {"testproject.testapp": {"handlers": ["mock"], "level": "DEBUG"}},
+                      "handlers": {"mock": {"level": "INFO"}}}
+        cfg.apply()
+        self.assertEqual(main_applier.stats['incremental'], incremental + 1)
+        self.assertEqual(logging.getLogger('testproject.testapp').handlers, [handler])
+        # the cache of the children was cleared too
+        self.assertTrue(child.isEnabledFor(logging.DEBUG))
+        self.assertEqual(handler.level, logging.INFO)
+
+    def test_reset_only_configured_loggers(self):
+        untouched = logging.getLogger('testproject.untouched')
+        manual_handler = logging.NullHandler()
+        untouched.addHandler(manual_handler)
+        cfg = Config(name='touched')
+        cfg.config = {"loggers": {"testproject.touched": {"handlers": ["mock"], "level": "DEBUG"}}}
+        cfg.apply()
+        touched = logging.getLogger('testproject.touched')
+        self.assertEqual(len(touched.handlers), 1)
+        self.assertEqual(main_applier.configured_loggers, {'testproject.touched'})
+        new_logging = deepcopy(settings.LOGGING)
+        new_logging['handlers']['console']['formatter'] = 'simple'
+        try:
+            with override_settings(LOGGING=new_logging):
+                self.assertTrue(main_applier.apply(Config.default().get_logging_config()))
+                # the configured logger was reset, the other one was not touched
+                self.assertEqual(touched.handlers, [])
+                self.assertEqual(touched.level, logging.NOTSET)
+                self.assertEqual(untouched.handlers, [manual_handler])
+        finally:
+            untouched.removeHandler(manual_handler)
+
+    def test_reset_child_not_disabled(self):
+        child = logging.getLogger('testproject.parent.child')
+        disabling = dict(settings.LOGGING, disable_existing_loggers=True)
+        for full in (False, True):
+            cfg = Config(name='child')
+            cfg.config = {"loggers": {"testproject.parent.child": {"handlers": ["mock"], "level": "DEBUG"}}}
+            with override_settings(LOGGING=disabling):
+                cfg.apply()
+            new_logging = deepcopy(disabling)
+            if full:
+                new_logging['handlers']['console']['formatter'] = 'simple'
+            cfg = Config(name='parent')
+            cfg.config = {"loggers": {"testproject.parent": {"handlers": ["mock"], "level": "INFO"}}}
+            with override_settings(LOGGING=new_logging):
+                self.assertEqual(main_applier.apply(cfg.get_logging_config()), full)
+            # like dictConfig, the child of a configured logger is reset but not disabled
+            self.assertFalse(child.disabled)
+            self.assertEqual((child.level, child.handlers), (logging.NOTSET, []))
+            with MockHandler.capture() as messages:
+                child.info('passed')
+            self.assertEqual(messages['info'], ['passed'])
+
+    def test_logger_created_while_applying(self):
+        cfg = Config(name='patterns')
+        cfg.config = {"loggers": {"testproject.racing.*": {"handlers": ["mock"], "level": "DEBUG"}}}
+        cfg.apply()
+        cfg.config = {"loggers": {"testproject.racing.*": {"handlers": ["mock"], "level": "ERROR"}}}
+        with main_applier._lock:
+            # another thread create a logger while the new config is being applied
+            thread = threading.Thread(target=logging.getLogger, args=('testproject.racing.created',))
+            thread.start()
+            thread.join(0.1)
+            self.assertTrue(thread.is_alive())
+            cfg.apply()
+        thread.join()
+        self.assertEqual(logging.getLogger('testproject.racing.created').level, logging.ERROR)
+
+    def test_logger_patterns(self):
+        existing = logging.getLogger('testproject.patterns.existing')
+        exact = logging.getLogger('testproject.patterns.exact')
+        cfg = Config(name='patterns')
+        cfg.config = {"loggers": {
+            "testproject.patterns.*": {"handlers": ["mock"], "level": "DEBUG"},
+            "testproject.patterns.exact": {"handlers": [], "level": "ERROR"},
+        }}
+        cfg.apply()
+        self.assertEqual(existing.level, logging.DEBUG)
+        self.assertEqual(len(existing.handlers), 1)
+        self.assertEqual(exact.level, logging.ERROR)
+        self.assertEqual(exact.handlers, [])
+        # the loggers created after the application are configured too, with their own handler list
+        created = logging.getLogger('testproject.patterns.created.sub')
+        self.assertEqual(created.level, logging.DEBUG)
+        self.assertEqual(created.handlers, existing.handlers)
+        self.assertIsNot(created.handlers, existing.handlers)
+        self.assertEqual(logging.getLogger('testproject.other').handlers, [])
+        self.assertIn('testproject.patterns.created.sub', main_applier.configured_loggers)
+        with MockHandler.capture() as messages:
+            created.debug('from created')
+            self.assertEqual(messages['debug'], ['from created'])
+
+        # a level change on a pattern update all the loggers it matched
+        cfg.config = {"loggers": {
+            "testproject.patterns.*": {"handlers": ["mock"], "level": "WARNING"},
+            "testproject.patterns.exact": {"handlers": [], "level": "ERROR"},
+        }}
+        cfg.apply()
+        self.assertEqual(existing.level, logging.WARNING)
+        self.assertEqual(created.level, logging.WARNING)
+
+        # without pattern, the loggers are reset and the creation is not hooked anymore
+        Config.default().apply()
+        self.assertEqual(created.handlers, [])
+        self.assertEqual(created.level, logging.NOTSET)
+        self.assertNotIn('getLogger', logging.Logger.manager.__dict__)
+        self.assertEqual(logging.getLogger('testproject.patterns.after').level, logging.NOTSET)
+
+    def test_compiled_config_cache(self):
+        cfg = Config(name='cached', config_json='{"loggers": {"testproject.testapp": {"level": "ERROR"}}}')
+        compiled = cfg.get_logging_config()
+        hits = compiled_configs.info().hits
+        self.assertIs(cfg.get_logging_config(), compiled)
+        self.assertEqual(compiled_configs.info().hits, hits + 1)
+        self.assertIs(Config(name='same', config_json=cfg.config_json).get_logging_config(), compiled)
+        new_logging = deepcopy(settings.LOGGING)
+        new_logging['handlers']['devnull']['level'] = 'WARNING'
+        with override_settings(LOGGING=new_logging):
+            self.assertIsNot(cfg.get_logging_config(), compiled)
+            self.assertEqual(cfg.get_logging_config()['handlers']['devnull']['level'], 'WARNING')
+        self.assertIs(cfg.get_logging_config(), compiled)
+        cfg.config_json = '{}'
+        self.assertEqual(cfg.get_logging_config()['loggers'], {})
+
     def test_messages_passed(self):
         with MockHandler.capture() as messages:
             self.assertEqual(messages['debug'], [])
@@ -706,12 +1570,73 @@ class ConfigApplyTest(TestCase):
         self.assertEqual(called, [t])
         main_scheduler.apply(t)
         self.assertEqual(called, [t])
+        # same effective config
         c.config_json = ''
         main_scheduler.apply(t)
+        self.assertEqual(called, [t])
+        c.config_json = '{"loggers": {"testproject.testapp": {"level": "ERROR"}}}'
+        main_scheduler.apply(t)
         self.assertEqual(called, [t, t])
         main_scheduler.apply(t)
         self.assertEqual(called, [t, t])
 
+    def test_effective_hash(self):
+        c1 = Config(name="lol", pk=1, config_json='{"loggers": {"testproject.testapp": {"level": "WARN"}}}')
+        c2 = Config(name="lol", pk=2, config_json=json.dumps({
+            "handlers": {},
+            "loggers": {"testproject.testapp": {
+                "propagate": True, "handlers": [], "filters": [], "level": logging.WARNING
+            }},
+        }))
+        self.assertNotEqual(c1.get_hash(), c2.get_hash())
+        self.assertEqual(c1.get_effective_hash(), c2.get_effective_hash())
+        c3 = Config(name="lol", pk=1, config_json='{"loggers": {"testproject.testapp": {"level": "ERROR"}}}')
+        self.assertNotEqual(c1.get_effective_hash(), c3.get_effective_hash())
+        # the default config is the same as a config with the same loggers and handlers
+        default_copy = Config(name='copy', pk=3)
+        default_copy.config = json.loads(Config.default().config_json)
+        self.assertEqual(default_copy.get_effective_hash(), Config.default().get_effective_hash())
+
+
+class LRUCacheTest(TestCase):
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        # b was the least recently used
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.info(), (2, 1, 2, 2))
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, 2, 0))
+
+
+class LoggerPatternTrieTest(TestCase):
+    def test_match(self):
+        trie = LoggerPatternTrie(['a.*', 'a.b.*', 'a.*.c', '*.sql'])
+        self.assertEqual(len(trie), 4)
+        self.assertEqual(trie.match('a.b.c.d'), 'a.b.*')
+        self.assertEqual(trie.match('a.x.c'), 'a.*.c')
+        self.assertEqual(trie.match('a.x.c.d'), 'a.*')
+        self.assertEqual(trie.match('a.b'), 'a.*')
+        self.assertEqual(trie.match('db.sql'), '*.sql')
+        self.assertIsNone(trie.match('a'))
+        self.assertIsNone(trie.match('db.sql.sub'))
+
+    def test_glob(self):
+        trie = LoggerPatternTrie(['myapp.pay*', 'myapp.payments', 'myapp.p*', 'myapp.*', 'db.*_sql.slow'])
+        self.assertEqual(trie.match('myapp.payments'), 'myapp.payments')
+        self.assertEqual(trie.match('myapp.payouts'), 'myapp.pay*')
+        self.assertEqual(trie.match('myapp.payouts.sub'), 'myapp.pay*')
+        self.assertEqual(trie.match('myapp.prices'), 'myapp.p*')
+        self.assertEqual(trie.match('myapp.orders'), 'myapp.*')
+        self.assertEqual(trie.match('db.main_sql.slow'), 'db.*_sql.slow')
+        self.assertIsNone(trie.match('db.main.slow'))
+        self.assertIsNone(trie.match('db.main_sql.slow.sub'))
+
 
 class TestTag(TestCase):
     def test_display_config_current_auto(self):
@@ -806,3 +1731,517 @@ class SignalHandlingTest(TestCase):
             Config.objects.count()
         self.assertEqual(len(msg['debug']), 1)
         self.assertTrue('SELECT COUNT(*)' in msg['debug'][0])
+
+
+class LoggerConfigMixin(object):
+    """
+    apply configs to the test logger `logger_name`, and restore an empty config after each test
+    """
+    logger_name = None
+    logger_config = {"handlers": ["mock"], "level": "DEBUG"}
+    """
+    the config of the test logger, updated by the arguments of apply_logger
+    """
+
+    def tearDown(self):
+        Config(name='nothing').apply()
+        super(LoggerConfigMixin, self).tearDown()
+
+    def apply_logger(self, handlers=None, requests=None, **cfg):
+        """
+        apply a config for the test logger, and return it
+        :param dict handlers: the handlers section of the config
+        :param dict requests: the requests section of the config
+        :param cfg: the keys to update in logger_config
+        :rtype: logging.Logger
+        """
+        config = Config(name=self.logger_name)
+        config.config = dict(
+            {"loggers": {self.logger_name: dict(self.logger_config, **cfg)}},
+            **{k: v for k, v in (('handlers', handlers), ('requests', requests)) if v is not None}
+        )
+        config.apply()
+        return logging.getLogger(self.logger_name)
+
+
+class SqlStreamTest(LoggerConfigMixin, TestCase):
+    logger_name = 'django.db.backends'
+
+    def setUp(self):
+        self.handler = AutoSignalsHandler()
+        self.handler.apply(('db_debug_stream',))
+        # the test project use the db_debug mode too: we keep only the streaming one
+        self.queries_logged = BaseDatabaseWrapper.__dict__['queries_logged']
+
+    def tearDown(self):
+        self.handler.sql_stream.teardown()
+        super(SqlStreamTest, self).tearDown()
+
+    def apply(self, **options):
+        self.apply_logger(**options)
+        BaseDatabaseWrapper.queries_logged = self.queries_logged
+
+    def test_stream(self):
+        self.apply()
+        queries = len(db_connection.queries_log)
+        with MockHandler.capture() as msg:
+            Config.objects.count()
+        self.assertEqual(len(msg['debug']), 1)
+        self.assertIn('SELECT COUNT(*)', msg['debug'][0])
+        # nothing is kept
+        self.assertEqual(len(db_connection.queries_log), queries)
+
+    def test_queries_logged(self):
+        self.apply()
+        db_connection.force_debug_cursor = True
+        try:
+            with MockHandler.capture() as msg:
+                Config.objects.count()
+        finally:
+            db_connection.force_debug_cursor = False
+        # the query is logged once, by the CursorDebugWrapper
+        self.assertEqual(len(msg['debug']), 1)
+        self.assertIn('SELECT COUNT(*)', msg['debug'][0])
+
+    def test_not_debug(self):
+        self.apply(level="INFO")
+        with MockHandler.capture() as msg:
+            Config.objects.count()
+        self.assertEqual(msg['debug'], [])
+
+    def test_slow_threshold(self):
+        self.apply(sql_slow_threshold=60)
+        with MockHandler.capture() as msg:
+            Config.objects.count()
+        self.assertEqual(msg['debug'], [])
+
+    def test_sample_rate(self):
+        self.apply(sql_sample_rate=0)
+        with MockHandler.capture() as msg:
+            for i in range(10):
+                Config.objects.count()
+        self.assertEqual(msg['debug'], [])
+        self.assertEqual(Config(config_json='{"loggers": {"a": {"sql_sample_rate": 0.5}}}').get_logging_config()
+                         ['loggers']['a']['sql_sample_rate'], 0.5)
+
+
+class RequestRulesTest(LoggerConfigMixin, TestCase):
+    logger_name = 'testscope'
+    logger_config = {"handlers": ["mock"], "level": "INFO", "propagate": False}
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.child = logging.getLogger('testscope.child')
+
+    def apply(self, **rule):
+        self.apply_logger(requests={"rule": dict(rule, loggers={"testscope": "DEBUG"})})
+
+    def get(self, path='/', **headers):
+        messages = {'debug': [], 'info': []}
+
+        def view(request):
+            with MockHandler.capture() as msg:
+                logging.getLogger('testscope').debug('parent')
+                self.child.debug('child')
+                logging.getLogger('testscope').info('info')
+            messages.update(msg)
+
+        request = self.factory.get(path, **headers)
+        request.user = type('User', (), {'pk': 42})
+        RequestLoggingMiddleware(view)(request)
+        return messages
+
+    def test_header(self):
+        self.apply(header='X-Debug-Logging', value='secret')
+        self.assertEqual(self.get(HTTP_X_DEBUG_LOGGING='secret')['debug'], ['parent', 'child'])
+        self.assertEqual(self.get(HTTP_X_DEBUG_LOGGING='other')['debug'], [])
+        self.assertEqual(self.get()['info'], ['info'])
+        # the level of the loggers is not changed
+        self.assertFalse(logging.getLogger('testscope').isEnabledFor(logging.DEBUG))
+        self.assertEqual(logging.getLogger('testscope').level, logging.INFO)
+
+    def test_selectors(self):
+        self.apply(path_prefix='/api/', user_id=[41, 42])
+        self.assertEqual(self.get('/api/users')['debug'], ['parent', 'child'])
+        self.assertEqual(self.get('/admin/')['debug'], [])
+        self.apply(path_prefix='/api/', user_id=41)
+        self.assertEqual(self.get('/api/users')['debug'], [])
+        self.apply(sample=0)
+        self.assertEqual(self.get()['debug'], [])
+
+    def test_rules_removed(self):
+        self.apply(header='X-Debug-Logging')
+        self.assertIn('isEnabledFor', self.child.__dict__)
+        Config(name='nothing').apply()
+        self.assertEqual(main_request_rules.rules, [])
+        self.assertNotIn('isEnabledFor', self.child.__dict__)
+
+    def test_created_after(self):
+        self.apply(header='X-Debug-Logging')
+        created = logging.getLogger('testscope.created')
+        self.assertIn('isEnabledFor', created.__dict__)
+        self.assertNotIn('isEnabledFor', logging.getLogger('testscopeother.created').__dict__)
+        self.child = created
+        self.assertEqual(self.get(HTTP_X_DEBUG_LOGGING='1')['debug'], ['parent', 'child'])
+        Config(name='nothing').apply()
+        self.assertNotIn('isEnabledFor', created.__dict__)
+        self.assertNotIn('getLogger', logging.Logger.manager.__dict__)
+
+    def test_created_after_with_patterns(self):
+        # the applier hook the creation of the loggers too, for its patterns
+        requests = {"rule": {"header": "X-Debug-Logging", "loggers": {"testscope": "DEBUG"}}}
+        patterns = Config(name='patterns')
+        patterns.config = {"loggers": {"testscope.patterns.*": self.logger_config}, "requests": requests}
+        scoped = Config(name='scoped')
+        scoped.config = {"loggers": {}, "requests": requests}
+        for config in (patterns, scoped, patterns):
+            config.apply()
+            created = logging.getLogger('testscope.patterns.%s' % config.name)
+            self.assertIn('isEnabledFor', created.__dict__)
+        self.assertEqual(created.level, logging.INFO)
+        Config(name='nothing').apply()
+        self.assertNotIn('getLogger', logging.Logger.manager.__dict__)
+
+    def test_effective_hash(self):
+        config = Config(name='scoped', config_json='{"requests": {"rule": {"header": "X-Debug"}}}')
+        self.assertNotEqual(config.get_effective_hash(), Config(name='empty').get_effective_hash())
+
+
+class RecordsHandler(logging.Handler):
+    """
+    a handler that keep the records it handle
+    """
+
+    def __init__(self):
+        super(RecordsHandler, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class SamplingTest(LoggerConfigMixin, TestCase):
+    logger_name = 'testsample'
+
+    def apply(self, sample):
+        return self.apply_logger(sample=sample)
+
+    def test_sample_all(self):
+        sampled = self.apply(0)
+        with MockHandler.capture() as msg:
+            sampled.info('dropped')
+            sampled.error('dropped')
+        self.assertEqual(msg['info'] + msg['error'], [])
+        sampled = self.apply(1)
+        with MockHandler.capture() as msg:
+            sampled.info('kept')
+        self.assertEqual(msg['info'], ['kept'])
+
+    def test_sample_by_level(self):
+        sampled = self.apply({"INFO": 0.5, "DEBUG": 0})
+        with MockHandler.capture() as msg:
+            for i in range(1000):
+                sampled.info('maybe')
+                sampled.debug('dropped')
+            sampled.error('kept')
+        self.assertEqual(msg['debug'], [])
+        self.assertEqual(msg['error'], ['kept'])
+        self.assertTrue(350 < len(msg['info']) < 650, len(msg['info']))
+
+    def test_sample_removed(self):
+        sampled = self.apply(0.5)
+        self.assertIn('_log', sampled.__dict__)
+        self.apply_logger()
+        self.assertNotIn('_log', sampled.__dict__)
+
+    def test_without_stacklevel(self):
+        with mock.patch('dynamic_logging.applier.STACKLEVEL', False):
+            sampled = self.apply({'INFO': 0})
+        self.assertNotIn('_log', sampled.__dict__)
+        sampler, = sampled.filters
+        self.assertIsInstance(sampler, SamplingFilter)
+        handler = RecordsHandler()
+        sampled.addHandler(handler)
+        sampled.info('dropped')
+        lineno = sys._getframe().f_lineno + 1
+        sampled.warning('kept')
+        record, = handler.records
+        self.assertEqual((record.pathname, record.lineno), (__file__, lineno))
+        self.apply_logger()
+        self.assertEqual(sampled.filters, [])
+
+    def test_filter(self):
+        record = logging.LogRecord('testsample', logging.INFO, __file__, 1, 'msg', (), None)
+        self.assertFalse(SamplingFilter({'INFO': 0}).filter(record))
+        self.assertTrue(SamplingFilter({'DEBUG': 0}).filter(record))
+
+    @skipIf(sys.version_info < (3, 8), "no stacklevel")
+    def test_caller(self):
+        for sample in (1, {'INFO': 1}):
+            sampled = self.apply(sample)
+            handler = RecordsHandler()
+            sampled.addHandler(handler)
+            lineno = sys._getframe().f_lineno + 1
+            sampled.info('kept')
+            record, = handler.records
+            self.assertEqual((record.pathname, record.lineno, record.funcName), (__file__, lineno, 'test_caller'))
+
+    def test_invalid_sample(self):
+        with self.assertRaises(ValueError):
+            self.apply({"NOTALEVEL": 0.5})
+
+
+class RateLimitTest(LoggerConfigMixin, TestCase):
+    logger_name = 'testlimit'
+
+    def test_rate_limit(self):
+        limited = self.apply_logger(rate_limit={'rate': 2, 'period': 0.2})
+        with MockHandler.capture() as msg:
+            for i in range(10):
+                limited.info('same %s', i)
+                limited.info('other')
+            limited.error('same %s', 'error')
+        self.assertEqual(msg['info'], ['same 0', 'other', 'same 1', 'other'])
+        self.assertEqual(msg['error'], ['same error'])
+        time.sleep(0.2)
+        with MockHandler.capture() as msg:
+            limited.info('same %s', 'again')
+        self.assertEqual(msg['info'], ["8 records like 'same %s' were suppressed", 'same again'])
+
+    def test_with_sample(self):
+        limited = self.apply_logger(rate_limit=1, sample={'DEBUG': 0})
+        with MockHandler.capture() as msg:
+            for i in range(3):
+                limited.debug('dropped')
+                limited.info('limited')
+        self.assertEqual(msg['debug'], [])
+        self.assertEqual(msg['info'], ['limited'])
+        self.apply_logger()
+        self.assertNotIn('_log', limited.__dict__)
+
+    @skipIf(sys.version_info < (3, 8), "no stacklevel")
+    def test_caller(self):
+        for cfg in ({'rate_limit': {'rate': 1, 'period': 0.1}},
+                    {'rate_limit': {'rate': 1, 'period': 0.1}, 'sample': 1}):
+            limited = self.apply_logger(**cfg)
+            handler = RecordsHandler()
+            limited.addHandler(handler)
+            lineno = sys._getframe().f_lineno + 2
+            for i in range(2):
+                limited.info('same')
+            time.sleep(0.1)
+            limited.info('same')
+            summary, kept = handler.records[1:]
+            self.assertEqual(summary.getMessage(), "1 records like 'same' were suppressed")
+            for record, line in zip(handler.records, (lineno, lineno + 2, lineno + 2)):
+                self.assertEqual((record.pathname, record.lineno, record.funcName), (__file__, line, 'test_caller'))
+
+    def test_without_stacklevel(self):
+        with mock.patch('dynamic_logging.applier.STACKLEVEL', False):
+            limited = self.apply_logger(rate_limit={'rate': 1, 'period': 0.1}, sample={'DEBUG': 0})
+        self.assertNotIn('_log', limited.__dict__)
+        self.assertEqual([type(f) for f in limited.filters], [SamplingFilter, RateLimitFilter])
+        handler = RecordsHandler()
+        limited.addHandler(handler)
+        limited.debug('dropped')
+        lineno = sys._getframe().f_lineno + 2
+        for i in range(3):
+            limited.info('same')
+        time.sleep(0.1)
+        limited.info('same')
+        first, kept = handler.records
+        self.assertEqual((first.pathname, first.lineno), (__file__, lineno))
+        self.assertEqual(kept.suppressed, 2)
+        self.apply_logger()
+        self.assertEqual(limited.filters, [])
+
+    def test_keys_bounded(self):
+        limiter = RateLimitFilter({'rate': 1, 'keys': 2})
+        for i in range(5):
+            self.assertEqual(limiter.allow('testlimit', logging.INFO, 'msg %d' % i), (True, 0))
+        self.assertEqual(len(limiter.keys), 2)
+        # it can be used as a handler filter too
+        record = logging.LogRecord('testlimit', logging.INFO, __file__, 1, 'msg 4', (), None)
+        self.assertFalse(limiter.filter(record))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.apply_logger(rate_limit={'period': 1})
+
+
+class SlowHandler(logging.Handler):
+    """
+    a handler that take some time to emit, and keep the messages
+    """
+    messages = []
+    delay = 0.05
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.messages.append(record.getMessage())
+
+
+queued_logging = deepcopy(settings.LOGGING)
+queued_logging['handlers']['slow'] = {'class': 'dynamic_logging.tests.SlowHandler', 'level': 'DEBUG'}
+
+
+@override_settings(LOGGING=queued_logging)
+class QueuedHandlerTest(LoggerConfigMixin, TestCase):
+    logger_name = 'testqueue'
+    logger_config = {"handlers": ["slow"], "level": "DEBUG"}
+
+    def setUp(self):
+        SlowHandler.messages = []
+
+    def apply(self, queue=None, **cfg):
+        return self.apply_logger(handlers={"slow": {"level": "DEBUG", "queue": queue}}, **cfg)
+
+    def test_not_blocking(self):
+        queued = self.apply(queue=True)
+        handler, = queued.handlers
+        self.assertIsInstance(handler, QueuedHandler)
+        self.assertIs(handler.target, main_applier.configurator.config['handlers']['slow'])
+        start = time.time()
+        for i in range(5):
+            queued.info('msg %d', i)
+        self.assertLess(time.time() - start, SlowHandler.delay)
+        handler.stop()
+        self.assertEqual(SlowHandler.messages, ['msg %d' % i for i in range(5)])
+
+    def test_toggle(self):
+        logger = self.apply()
+        slow = main_applier.configurator.config['handlers']['slow']
+        self.assertEqual(logger.handlers, [slow])
+        logger.info('direct')
+        stats = main_applier.stats.copy()
+        logger = self.apply(queue={'size': 100})
+        # the handler is reused: the toggle is an incremental application
+        self.assertEqual(main_applier.stats['full'], stats['full'])
+        handler, = logger.handlers
+        self.assertIs(handler.target, slow)
+        for i in range(5):
+            logger.info('queued %d', i)
+        # the records still in the queue are sent to the handler when the queue is removed
+        logger = self.apply()
+        self.assertEqual(logger.handlers, [slow])
+        self.assertTrue(handler.stopped)
+        logger.info('direct again')
+        self.assertEqual(SlowHandler.messages, ['direct'] + ['queued %d' % i for i in range(5)] + ['direct again'])
+        self.assertEqual(main_applier.queues, {})
+
+    def test_same_queue_kept(self):
+        handler, = self.apply(queue=True).handlers
+        self.assertEqual(self.apply(queue=True, level="INFO").handlers, [handler])
+        self.assertFalse(handler.stopped)
+
+    def test_drop_policy(self):
+        handler = QueuedHandler(SlowHandler(), {'size': 1, 'policy': 'drop'})
+        for i in range(5):
+            handler.handle(logging.LogRecord('testqueue', logging.INFO, __file__, 1, 'msg %d', (i,), None))
+        handler.close()
+        self.assertGreater(handler.dropped, 0)
+        self.assertEqual(len(SlowHandler.messages), 5 - handler.dropped)
+        self.assertEqual(SlowHandler.messages[0], 'msg 0')
+
+    def test_block_policy(self):
+        handler = QueuedHandler(SlowHandler(), {'size': 1, 'policy': 'block'})
+        for i in range(3):
+            handler.handle(logging.LogRecord('testqueue', logging.INFO, __file__, 1, 'msg %d', (i,), None))
+        handler.close()
+        self.assertEqual(handler.dropped, 0)
+        self.assertEqual(SlowHandler.messages, ['msg 0', 'msg 1', 'msg 2'])
+
+    def test_failed_apply(self):
+        self.apply()
+        threads = threading.active_count()
+        with self.assertRaises(ValueError):
+            self.apply(queue=True, level="NOTALEVEL")
+        # the queue created for the failed config is stopped and forgotten
+        self.assertEqual(main_applier.queues, {})
+        self.assertEqual(threading.active_count(), threads)
+        handler, = self.apply(queue=True).handlers
+        self.assertIsInstance(handler, QueuedHandler)
+        self.assertFalse(handler.stopped)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            self.apply(queue={'policy': 'wait'})
+
+
+recorder_logging = deepcopy(settings.LOGGING)
+recorder_logging['handlers']['recorder'] = {
+    'class': 'dynamic_logging.handlers.FlightRecorderHandler', 'level': 'DEBUG', 'capacity': 10, 'target': 'mock',
+}
+
+
+@override_settings(LOGGING=recorder_logging)
+class FlightRecorderTest(LoggerConfigMixin, TestCase):
+    logger_name = 'testrecorder'
+    logger_config = {"handlers": ["recorder"], "level": "DEBUG", "propagate": False}
+
+    def apply(self, **handler_cfg):
+        return self.apply_logger(handlers={"recorder": handler_cfg})
+
+    def test_flush_on_error(self):
+        recorded = self.apply(level='DEBUG')
+        recorder, = recorded.handlers
+        self.assertIsInstance(recorder, FlightRecorderHandler)
+        with MockHandler.capture() as msg:
+            recorded.debug('context %s', 1)
+            recorded.info('context %s', 2)
+            recorded.warning('context %s', 3)
+            self.assertEqual(msg['debug'] + msg['info'] + msg['warning'], [])
+            recorded.error('failed')
+            self.assertEqual(msg['debug'], ['context 1'])
+            self.assertEqual(msg['info'], ['context 2'])
+            self.assertEqual(msg['warning'], ['context 3'])
+            self.assertEqual(msg['error'], ['failed'])
+            # the buffer is emptied by the flush
+            recorded.error('failed again')
+            self.assertEqual(msg['debug'], ['context 1'])
+            self.assertEqual(msg['error'], ['failed', 'failed again'])
+
+    def test_config_options(self):
+        recorded = self.apply(level='DEBUG', capacity=2, flushLevel='WARNING')
+        recorder, = recorded.handlers
+        self.assertEqual((recorder.capacity, recorder.flushLevel), (2, logging.WARNING))
+        with MockHandler.capture() as msg:
+            for i in range(5):
+                recorded.debug('context %d', i)
+            recorded.warning('failed')
+        self.assertEqual(msg['debug'], ['context 4'])
+        self.assertEqual(msg['warning'], ['failed'])
+
+    def test_options_only_for_recorders(self):
+        self.apply_logger(handlers={"console": {"level": "DEBUG", "capacity": 2, "flushLevel": "ERROR"},
+                                    "recorder": {"level": "DEBUG", "capacity": 2}})
+        config = main_applier.applied
+        self.assertNotIn('capacity', config['handlers']['console'])
+        self.assertNotIn('flushLevel', config['handlers']['console'])
+        self.assertEqual(config['handlers']['recorder']['capacity'], 2)
+        merged = JsonLoggerWidget().merge_handlers_value({"console": {"capacity": 2}, "recorder": {"capacity": 2}})
+        self.assertNotIn('capacity', merged['console'])
+        self.assertEqual(merged['recorder']['capacity'], 2)
+
+    def test_by_thread(self):
+        recorded = self.apply(level='DEBUG')
+        thread = threading.Thread(target=recorded.debug, args=('other thread',))
+        thread.start()
+        thread.join()
+        with MockHandler.capture() as msg:
+            recorded.debug('this thread')
+            recorded.error('failed')
+        self.assertEqual(msg['debug'], ['this thread'])
+
+    def test_cleared_by_request(self):
+        recorded = self.apply(level='DEBUG')
+        recorded.debug('previous request')
+
+        def view(request):
+            recorded.debug('this request')
+            recorded.error('failed')
+
+        with MockHandler.capture() as msg:
+            RequestLoggingMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(msg['debug'], ['this request'])
+        self.assertEqual(msg['error'], ['failed'])
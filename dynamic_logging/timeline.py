@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+
+from dynamic_logging.index import TriggerIndex
+from dynamic_logging.models import Trigger
+
+TimelineEvent = namedtuple('TimelineEvent', ['date', 'trigger', 'applied'])
+"""
+a wake of the scheduler: the trigger enabled at this date, and whether the logging config really changed
+(the scheduler don't apply a config with the same effective state as the current one)
+"""
+
+
+def simulate(start, end, triggers=None):
+    """
+    return the sequence of triggers the scheduler would enable between start and end, with the same
+    precedence rules as Scheduler.get_next_wake. nothing is applied: it run in memory, without timer.
+
+    :param datetime.datetime start: the date at which the simulation start. the trigger active at this
+                                    date is the first event.
+    :param datetime.datetime end: the date at which the simulation stop (excluded)
+    :param triggers: the triggers to simulate (they don't need to be saved). if not given, the active
+                     triggers of the database are loaded in one query.
+    :rtype: list[TimelineEvent]
+    """
+    index = TriggerIndex.load(start) if triggers is None else TriggerIndex(triggers)
+    hashes = {}
+
+    def effective_hash(trigger):
+        config = trigger.config
+        key = (config.pk, config.config_json)
+        if key not in hashes:
+            hashes[key] = config.get_effective_hash()
+        return hashes[key]
+
+    current = index.current(start)
+    trigger = current or Trigger.default()
+    last_hash = effective_hash(trigger)
+    events = [TimelineEvent(start, trigger, True)]
+    trigger, at = index.get_next_wake(current, start)
+    while at is not None and at < end:
+        current_hash = effective_hash(trigger)
+        events.append(TimelineEvent(at, trigger, current_hash != last_hash))
+        last_hash = current_hash
+        trigger, at = index.get_next_wake(trigger, at)
+    return events
@@ -29,7 +29,8 @@ class JsonLoggerWidget(Textarea):
         """
         res = deepcopy(settings.LOGGING['handlers'])
         for name, handler in res.items():
-            handler.update({k: v for k, v in current_val.get(name, {}).items() if k in ('filters', 'level')})
+            keys = Config.get_handler_keys(handler)
+            handler.update({k: v for k, v in current_val.get(name, {}).items() if k in keys})
         res = OrderedDict(sorted(res.items()))
         return res
 
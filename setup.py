@@ -48,6 +48,8 @@ setup(
     ],
     packages=[
         'dynamic_logging',
+        'dynamic_logging.management',
+        'dynamic_logging.management.commands',
         'dynamic_logging.migrations',
         'dynamic_logging.templatetags',
     ],
@@ -48,6 +48,7 @@ MIDDLEWARE = (
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'dynamic_logging.middleware.RequestLoggingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -220,6 +221,10 @@ elif _timer_prop == 'timer':  # pragma: nocover
     DYNAMIC_LOGGING = {
         "upgrade_propagator": {'class': "dynamic_logging.propagator.TimerPropagator", 'config': {'interval': 15}}
     }
+elif _timer_prop == 'cache':  # pragma: nocover
+    DYNAMIC_LOGGING = {
+        "upgrade_propagator": {'class': "dynamic_logging.propagator.CachePropagator", 'config': {'interval': 0.5}}
+    }
 elif _timer_prop == 'amqp':  # pragma: nocover
     # docker run -d --hostname rabbitmq --name rabbitmq -p 15672:15672 -p 5672:5672
     #     -e RABBITMQ_DEFAULT_USER=guest -e RABBITMQ_DEFAULT_PASS=guest rabbitmq:3.6.6-management
@@ -232,4 +237,4 @@ elif _timer_prop == 'dummy':  # pragma: nocover
         "upgrade_propagator": {'class': "dynamic_logging.propagator.DummyPropagator", 'config': {}}
     }
 else:  # pragma: nocover
-    raise Exception("%s is not a valid timer propagator. choose one of signal,timer,amqp,dummy")
+    raise Exception("%s is not a valid timer propagator. choose one of signal,timer,cache,amqp,dummy")
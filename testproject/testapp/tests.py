@@ -54,8 +54,9 @@ class TestPages(TestCase):
 
 
 @override_settings(
-    DYNAMIC_LOGGING={"upgrade_propagator": {'class': "dynamic_logging.propagator.ThreadSignalPropagator", 'config': {}}
-                     }
+    DYNAMIC_LOGGING={"upgrade_propagator": {'class': "dynamic_logging.propagator.ThreadSignalPropagator",
+                                            # the test transaction is never commited
+                                            'config': {'on_commit': False}}}
 )
 class TestAdminContent(TestCase):
 